@@ -0,0 +1,81 @@
+"""Measures the startup time of Flowat, each sample in a fresh interpreter.
+
+    python benchmarks/startup.py [--repeat N] [--no-window]
+
+Reports the median time to import `flowat.data` and `flowat.app`, and the time from
+interpreter start to the first window shown by `flowat.app.main`, which needs a
+display and the Toga backend of the platform.
+"""
+from argparse import ArgumentParser
+from pathlib import Path
+from statistics import median
+import subprocess
+import sys
+import os
+
+SRC_PATH = Path(__file__).resolve().parents[1] / "src"
+
+IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+# `on_running` is called once the main loop starts, after `startup` showed the window
+WINDOW_SCRIPT = """
+import time
+start = time.perf_counter()
+from flowat.app import Flowat
+
+class StartupBenchmark(Flowat):
+    async def on_running(self):
+        print(time.perf_counter() - start, flush=True)
+        self.request_exit()
+
+StartupBenchmark("Flowat", "flowat").main_loop()
+"""
+
+
+def run_sample(script: str) -> float:
+    """Runs `script` in a new interpreter, returning the time it printed."""
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": str(SRC_PATH)},
+        timeout=120,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--no-window", action="store_true", help="Skip the time to first window."
+    )
+    args = parser.parse_args()
+
+    benchmarks = {
+        "import flowat.data": IMPORT_SCRIPT.format(module="flowat.data"),
+        "import flowat.app": IMPORT_SCRIPT.format(module="flowat.app"),
+    }
+    if not args.no_window:
+        benchmarks["first window"] = WINDOW_SCRIPT
+    for name, script in benchmarks.items():
+        try:
+            samples = [run_sample(script) for _ in range(args.repeat)]
+        except RuntimeError as err:
+            print(f"{name:<20} failed: {err}")
+            continue
+        print(
+            f"{name:<20} median {median(samples) * 1000:8.1f} ms"
+            f"  (min {min(samples) * 1000:.1f} ms, {args.repeat} runs)"
+        )
+
+
+if __name__ == "__main__":
+    main()
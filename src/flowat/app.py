@@ -1,6 +1,6 @@
 import toga
 
-from flowat import pages, plot
+from flowat import pages
 
 
 class Flowat(toga.App):
@@ -13,7 +13,6 @@ class Flowat(toga.App):
         """
         self.main_page = pages.main.MainSection(app=self)
         main_box = self.main_page.full_contents
-        plot.base.ensure_plotlyjs()
 
         self.main_window = toga.Window(title=self.formal_name)
         self.main_window.content = main_box
@@ -6,8 +6,13 @@ from configparser import (
 )
 from decimal import Decimal
 from typing import Any, Callable, Iterator
+from threading import RLock
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
 from sys import platform
+import io
+import os
 
 if platform == "win32":
     FLOWAT_FILES_PATH = Path.home().joinpath("AppData", "Local", "Flowat")
@@ -18,8 +23,15 @@ else:
     CONFIG_PATH = Path.home().joinpath(".config", "Flowat")
     LOG_PATH = Path.home().joinpath(".local", "state", "Flowat", "log")
 
-for dir in [FLOWAT_FILES_PATH, CONFIG_PATH, LOG_PATH]:
-    dir.mkdir(parents=True, exist_ok=True)
+
+# parsed config files, with the (mtime, size) of the file when they were read
+_parsers: dict[Path, tuple[tuple[int, int], ConfigParser]] = {}
+_parsers_lock = RLock()
+
+# changes gathered by the current `transaction`, per file, section and key
+_pending_changes: ContextVar[dict[Path, dict[str, dict[str, str]]] | None] = (
+    ContextVar("_pending_changes", default=None)
+)
 
 
 def get_parser(filename: str) -> ConfigParser:
@@ -27,16 +39,139 @@ def get_parser(filename: str) -> ConfigParser:
     The parser factories should not take any input value, and return this function's
     return value with the same inputs.
 
+    Parsers are shared by the whole process, and a file is only read again when its
+    modification time or size changed, like after being edited by another process.
+    They must not be changed, use `save_option` instead. Inside a `transaction`, the
+    parser includes the changes not written yet.
+
     :filename: Name of the config file without extension.
     """
-    parser = ConfigParser()
     config_file = Path(CONFIG_PATH, f"{filename}.ini")
-    config_file.touch(exist_ok=True)
+    with _parsers_lock:
+        try:
+            stat = config_file.stat()
+        except FileNotFoundError:
+            CONFIG_PATH.mkdir(parents=True, exist_ok=True)
+            config_file.touch(exist_ok=True)
+            stat = config_file.stat()
+        cached = _parsers.get(config_file)
+        if cached is not None and cached[0] == (stat.st_mtime_ns, stat.st_size):
+            parser = cached[1]
+        else:
+            parser = _read_parser(config_file)
+            _parsers[config_file] = ((stat.st_mtime_ns, stat.st_size), parser)
+    pending = _pending_changes.get()
+    if pending and config_file in pending:
+        parser = _copy_parser(parser)
+        _apply_changes(parser, pending[config_file])
+    return parser
+
+
+def save_option(
+    config_file: Path, section: str, key: str | None = None, value: str | None = None
+):
+    """Sets `key` to `value` in `section` of `config_file`, creating the section if
+    it does not exist, or only creates the section if `key` is `None`.
+
+    The file is read again and replaced atomically while holding a lock shared with
+    other Flowat processes, so changes made by them since it was last read are kept.
+    Inside a `transaction`, the change is only written when it ends.
+    """
+    changes = {section: {} if key is None else {key: value}}
+    pending = _pending_changes.get()
+    if pending is None:
+        _write_changes(config_file, changes)
+        return
+    file_changes = pending.setdefault(config_file, {})
+    for section, options in changes.items():
+        file_changes.setdefault(section, {}).update(options)
+
+
+@contextmanager
+def transaction() -> Iterator[None]:
+    """Context manager that gathers the config changes made inside the `with` block,
+    and writes each changed file once, atomically, when it ends. Nothing is written
+    if the block raises. Nested calls are part of the outermost transaction.
+    """
+    if _pending_changes.get() is not None:
+        yield
+        return
+    pending = {}
+    token = _pending_changes.set(pending)
+    try:
+        yield
+    finally:
+        _pending_changes.reset(token)
+    for config_file, changes in pending.items():
+        _write_changes(config_file, changes)
+
+
+def _write_changes(config_file: Path, changes: dict[str, dict[str, str]]):
+    with _parsers_lock, _file_lock(config_file):
+        parser = _read_parser(config_file)
+        _apply_changes(parser, changes)
+        tmp_file = config_file.with_name(f"{config_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, "w") as configfile:
+            parser.write(configfile)
+            configfile.flush()
+            os.fsync(configfile.fileno())
+        os.replace(tmp_file, config_file)
+        stat = config_file.stat()
+        _parsers[config_file] = ((stat.st_mtime_ns, stat.st_size), parser)
+
+
+@contextmanager
+def _file_lock(config_file: Path) -> Iterator[None]:
+    """Holds an exclusive lock on a file next to `config_file`, since the config
+    file itself is replaced on every write.
+    """
+    lock_file = config_file.with_name(f"{config_file.name}.lock")
+    with open(lock_file, "a+") as f:
+        if platform == "win32":
+            import msvcrt
+
+            f.seek(0)
+            # retries for about 10 seconds before raising `OSError`
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _read_parser(config_file: Path) -> ConfigParser:
+    parser = ConfigParser()
     parser.read(config_file)
     parser._config_file = config_file
     return parser
 
 
+def _copy_parser(parser: ConfigParser) -> ConfigParser:
+    buffer = io.StringIO()
+    parser.write(buffer)
+    new_parser = ConfigParser()
+    new_parser.read_string(buffer.getvalue())
+    new_parser._config_file = parser._config_file
+    return new_parser
+
+
+def _apply_changes(parser: ConfigParser, changes: dict[str, dict[str, str]]):
+    for section, options in changes.items():
+        if not parser.has_section(section):
+            parser.add_section(section)
+        for key, value in options.items():
+            parser.set(section, key, value)
+
+
 def get_default_parser() -> ConfigParser:
     """Factory of parsers for the 'prefs.ini' config file."""
     return get_parser(filename="prefs")
@@ -68,15 +203,12 @@ class _Config:
         )
         parser = self._parser_factory()
         if not parser.has_section(section):
-            parser.add_section(section=section)
-            with open(parser._config_file, "w") as configfile:
-                parser.write(configfile)
+            save_option(parser._config_file, section)
 
     @classmethod
     def get(cls):
         """Get current value of this config, or the default value if not defined."""
         interactor = cls()
-        print(interactor)
         return interactor.__get()
 
     @classmethod
@@ -87,9 +219,7 @@ class _Config:
 
     def __set(self, value: Any):
         parser = self._parser_factory()
-        parser.set(self._section, self._key, str(value))
-        with open(parser._config_file, "w") as configfile:
-            parser.write(configfile)
+        save_option(parser._config_file, self._section, self._key, str(value))
 
     def __get(self) -> Any | None:
         parser = self._parser_factory()
@@ -126,9 +256,7 @@ class _ConfigList:
         )
         parser = self._parser_factory()
         if not parser.has_section(section):
-            parser.add_section(section)
-            with open(parser._config_file, "w") as configfile:
-                parser.write(configfile)
+            save_option(parser._config_file, section)
 
     @classmethod
     def get(cls) -> list[Any]:
@@ -175,9 +303,7 @@ class _ConfigList:
             .replace("\\\\", "\\")
         )
         parser = self._parser_factory()
-        parser.set(self._section, self._key, string_list)
-        with open(parser._config_file, "w") as configfile:
-            parser.write(configfile)
+        save_option(parser._config_file, self._section, self._key, string_list)
 
     def __add(self, value: str):
         current = [i for i in self.__get()]
@@ -231,3 +357,145 @@ class BackupPlaces(_ConfigList):
             key="backup_places",
             default=[],
         )
+
+
+class DatabaseJournalMode(_Config):
+    def __init__(self):
+        super().__init__(
+            parser_factory=get_default_parser,
+            section="database",
+            key="journal_mode",
+            default="WAL",
+        )
+
+    @classmethod
+    def get(cls) -> str:
+        value = super().get()
+        return str(value).upper()
+
+
+class DatabaseSynchronous(_Config):
+    def __init__(self):
+        super().__init__(
+            parser_factory=get_default_parser,
+            section="database",
+            key="synchronous",
+            default="NORMAL",
+        )
+
+    @classmethod
+    def get(cls) -> str:
+        value = super().get()
+        return str(value).upper()
+
+
+class DatabaseMmapSize(_Config):
+    def __init__(self):
+        super().__init__(
+            parser_factory=get_default_parser,
+            section="database",
+            key="mmap_size",
+            default=268435456,
+        )
+
+    @classmethod
+    def get(cls) -> int:
+        value = super().get()
+        return int(value)
+
+
+class DatabaseCacheSize(_Config):
+    def __init__(self):
+        """Page cache size, negative values are the size in KiB instead of pages."""
+        super().__init__(
+            parser_factory=get_default_parser,
+            section="database",
+            key="cache_size",
+            default=-65536,
+        )
+
+    @classmethod
+    def get(cls) -> int:
+        value = super().get()
+        return int(value)
+
+
+class DatabaseTempStore(_Config):
+    def __init__(self):
+        super().__init__(
+            parser_factory=get_default_parser,
+            section="database",
+            key="temp_store",
+            default="MEMORY",
+        )
+
+    @classmethod
+    def get(cls) -> str:
+        value = super().get()
+        return str(value).upper()
+
+
+class DatabaseBusyTimeout(_Config):
+    def __init__(self):
+        """Milliseconds to wait for a lock held by another connection."""
+        super().__init__(
+            parser_factory=get_default_parser,
+            section="database",
+            key="busy_timeout",
+            default=5000,
+        )
+
+    @classmethod
+    def get(cls) -> int:
+        value = super().get()
+        return int(value)
+
+
+class ThemeMode(_Config):
+    def __init__(self):
+        """Theme of the app, either "auto" to follow the OS, "light" or "dark"."""
+        super().__init__(
+            parser_factory=get_default_parser,
+            section="appearance",
+            key="theme",
+            default="auto",
+        )
+
+    @classmethod
+    def get(cls) -> str:
+        value = super().get()
+        return str(value).strip().lower()
+
+
+class PlotDiskCache(_Config):
+    def __init__(self):
+        """Whether rendered plots are also cached on disk, to be reused after a restart."""
+        super().__init__(
+            parser_factory=get_default_parser,
+            section="plot",
+            key="disk_cache",
+            default=True,
+        )
+
+    @classmethod
+    def get(cls) -> bool:
+        value = super().get()
+        return str(value).strip().lower() in ("true", "1", "yes", "on")
+
+
+class PlotRenderer(_Config):
+    def __init__(self):
+        """Library that draws charts: "svg", "plotly", or "auto" to use SVG for
+        short series.
+        """
+        super().__init__(
+            parser_factory=get_default_parser,
+            section="plot",
+            key="renderer",
+            default="auto",
+        )
+
+    @classmethod
+    def get(cls) -> str:
+        value = super().get()
+        return str(value).strip().lower()
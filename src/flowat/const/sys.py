@@ -1,7 +1,13 @@
+from functools import cache
+from threading import Thread
 from pathlib import Path
 from sys import platform
-from os import makedirs
+from typing import Any
 import subprocess
+import logging
+import os
+
+from flowat import config
 
 if platform == "win32":
     FLOWAT_FILES_PATH = Path.home().joinpath("AppData", "Local", "Flowat")
@@ -12,18 +18,84 @@ else:
     CONFIG_PATH = Path.home().joinpath(".config", "Flowat")
     LOG_PATH = Path.home().joinpath(".local", "state", "Flowat", "logs")
 
-for dirpath in [FLOWAT_FILES_PATH, CONFIG_PATH, LOG_PATH]:
-    makedirs(dirpath, exist_ok=True)
+logger = logging.getLogger(__name__)
+
+THEME_CHOICES = ("auto", "light", "dark")
+THEME_CACHE_FILE = Path(CONFIG_PATH, "theme.cache")
+# seconds to wait for the OS, while blocking startup or in the background
+THEME_PROBE_TIMEOUT = 0.5
+THEME_REFRESH_TIMEOUT = 5.0
 
 
 def sys_dark_mode() -> bool:
-    """Detects if dark mode is currently enabled in the OS.
+    """Detects if dark mode is currently enabled in the OS, unless the theme is
+    pinned by the 'theme' option in the '[appearance]' section of 'prefs.ini'.
+
+    The last detected theme is kept in `THEME_CACHE_FILE`. When it exists, it is
+    returned right away and refreshed in a background thread, so a change in the OS
+    theme shows on the next launch. Otherwise, the OS is asked directly, and light
+    mode is assumed if it does not answer within `THEME_PROBE_TIMEOUT` seconds.
+
+    A pinned theme that is not one of `THEME_CHOICES` is logged and treated as
+    "auto", so a typo in 'prefs.ini' does not keep the app from starting.
 
     :returns: `True` if dark mode is enabled, `False` otherwise.
     """
+    theme = config.ThemeMode.get()
+    if theme not in THEME_CHOICES:
+        logger.warning(
+            f"Expected 'theme' in '[appearance]' to be one of {THEME_CHOICES}, "
+            f"got '{theme}', using 'auto'."
+        )
+        theme = "auto"
+    if theme != "auto":
+        return theme == "dark"
+    cached = _read_theme_cache()
+    if cached is None:
+        cached = _refresh_theme_cache(timeout=THEME_PROBE_TIMEOUT)
+        if cached is not None:
+            return cached
+    # a slow OS answer is still cached for the next launch
+    Thread(
+        target=_refresh_theme_cache,
+        kwargs={"timeout": THEME_REFRESH_TIMEOUT},
+        name="theme-probe",
+        daemon=True,
+    ).start()
+    return bool(cached)
+
+
+def _read_theme_cache() -> bool | None:
+    try:
+        theme = THEME_CACHE_FILE.read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    return {"dark": True, "light": False}.get(theme)
+
+
+def _refresh_theme_cache(timeout: float) -> bool | None:
+    """Asks the OS for the current theme and stores it in `THEME_CACHE_FILE`, unless
+    the OS could not tell within `timeout` seconds.
+    """
+    dark = _probe_dark_mode(timeout=timeout)
+    if dark is None:
+        return None
+    tmp_file = THEME_CACHE_FILE.with_name(f"{THEME_CACHE_FILE.name}.tmp")
+    try:
+        THEME_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file.write_text("dark" if dark else "light", encoding="utf-8")
+        os.replace(tmp_file, THEME_CACHE_FILE)
+    except OSError:
+        # the cache only saves time, the theme was detected anyway
+        pass
+    return dark
+
+
+def _probe_dark_mode(timeout: float) -> bool | None:
+    """Asks the OS if dark mode is enabled, returns `None` if it could not tell."""
     match platform:
         case "linux":
-            return _linux_dark_mode()
+            return _linux_dark_mode(timeout=timeout)
         case "win32":
             return False  # ignore while dark theme is not implemented for winforms
             # return _windows_dark_mode()
@@ -53,24 +125,38 @@ def _windows_dark_mode() -> bool:
         return False
 
 
-def _linux_dark_mode() -> bool:
+def _linux_dark_mode(timeout: float = THEME_PROBE_TIMEOUT) -> bool | None:
     """Detects if dark mode is enabled in a GTK3/4 based GNU/Linux system.
-    Will depend on `gsettings` being installed in the system to work properly.
+    Will depend on `gsettings` being installed in the system to work properly, and
+    returns `None` if it is missing or takes longer than `timeout` seconds.
     """
-    result = subprocess.run(
-        ["gsettings", "get", "org.gnome.desktop.interface", "gtk-theme"],
-        capture_output=True,
-        text=True,
-    )
+    try:
+        result = subprocess.run(
+            ["gsettings", "get", "org.gnome.desktop.interface", "gtk-theme"],
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
     return "dark" in result.stdout.lower()
 
 
-if sys_dark_mode():
-    BG_COLOR = "#1e1e1e"
-    FG_COLOR = "#e1e1e1"
-else:
+@cache
+def theme_colors() -> dict[str, str]:
+    """Background and foreground colors matching the theme from `sys_dark_mode`,
+    detected once on first use. Also available as `BG_COLOR` and `FG_COLOR`.
+    """
+    if sys_dark_mode():
+        return {"BG_COLOR": "#1e1e1e", "FG_COLOR": "#e1e1e1"}
     if platform == "win32":
-        BG_COLOR = "#f0f0f0"
-    else:
-        BG_COLOR = "#fff"
-    FG_COLOR = "#1e1e1e"
+        return {"BG_COLOR": "#f0f0f0", "FG_COLOR": "#1e1e1e"}
+    return {"BG_COLOR": "#fff", "FG_COLOR": "#1e1e1e"}
+
+
+def __getattr__(name: str) -> Any:
+    if name in ("BG_COLOR", "FG_COLOR"):
+        return theme_colors()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
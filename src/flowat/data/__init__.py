@@ -1 +1 @@
-from . import db, backup
\ No newline at end of file
+from . import db, backup, export
\ No newline at end of file
@@ -0,0 +1,24 @@
+from argparse import ArgumentParser
+
+from . import db
+
+
+def main():
+    parser = ArgumentParser(
+        prog="python -m flowat.data",
+        description="Maintenance commands for the Flowat database.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser(
+        "rebuild-summaries",
+        help="Recompute the monthly summary tables from the ledgers.",
+    )
+    args = parser.parse_args()
+    match args.command:
+        case "rebuild-summaries":
+            db.rebuild_monthly_summaries()
+            print("Monthly summaries rebuilt.")
+
+
+if __name__ == "__main__":
+    main()
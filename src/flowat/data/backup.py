@@ -1,11 +1,12 @@
 from os import path, rename, makedirs
+from typing import Callable
 from sys import platform
 from pathlib import Path
 from datetime import datetime
 import configparser
 import sqlite3
 import logging
-import shutil
+import os
 
 from .db import DB_FILE, DATA_PATH
 from flowat import config
@@ -23,12 +24,16 @@ else:
 CONFIG_FILE = Path(CONFIG_PATH, "backup.ini")
 LOG_FILE = Path(LOG_PATH, f"{__name__}.log")
 BACKUP_PATH = Path(DATA_PATH, "backup")
-
-for dirpath in [FLOWAT_FILES_PATH, CONFIG_PATH, LOG_PATH, BACKUP_PATH]:
-    dirpath.mkdir(parents=True, exist_ok=True)
+# pages copied by each step of `backup_database`, the database is unlocked between steps
+BACKUP_PAGES_PER_STEP = 256
+# times a backup may start over because of writes, before copying all pages at once
+BACKUP_MAX_RESTARTS = 3
 
 logger = logging.getLogger(__name__)
-loghandler = logging.FileHandler(filename=LOG_FILE, mode="a", encoding="utf-8")
+# the log file is only opened on the first record, after `run` creates its directory
+loghandler = logging.FileHandler(
+    filename=LOG_FILE, mode="a", encoding="utf-8", delay=True
+)
 loghandler.setFormatter(
     logging.Formatter("%(asctime)s %(levelname)s: %(message)s")
 )
@@ -38,35 +43,125 @@ logger.setLevel(logging.DEBUG)
 
 
 
-def copy_file(source_path: str, target_dir: str):
-    """Copies a file to `target_dir`.
+def backup_database(
+    source_path: str,
+    target_dir: str,
+    on_progress: Callable[[int, int], None] | None = None,
+    pages: int = BACKUP_PAGES_PER_STEP,
+) -> Path:
+    """Copies the SQLite database at `source_path` to a new file in `target_dir`
+    with the SQLite backup API, which gives a consistent copy even while the app
+    writes to the database. The copy is made `pages` pages at a time, so the
+    database is only locked for short periods, or all at once if writes keep
+    restarting it. The copy is checked with `PRAGMA integrity_check` before being
+    renamed to its final name.
 
-    :param source_path: Full path to the file to be copied.
-    :param target_dir: Directory where the file will be copied into.
+    :param source_path: Full path to the database file.
+    :param target_dir: Directory where the backup will be created.
+    :param on_progress: Called after each step with the number of pages copied and
+      the total number of pages.
+    :param pages: Number of pages copied on each step.
+    :returns: Path to the backup file.
+    :raises FileNotFoundError: If `source_path` or `target_dir` does not exist.
+    :raises sqlite3.DatabaseError: If the backup fails the integrity check.
     """
-    logger.debug("function call: copy_file")
-    if not path.exists(target_dir):
-        logger.error(f"Could not copy file to '{target_dir}', directory does not exist.")
+    LOG_PATH.mkdir(parents=True, exist_ok=True)
+    logger.debug("function call: backup_database")
+    if not path.isfile(source_path):
+        raise FileNotFoundError(f"Database file '{source_path}' does not exist.")
+    if not path.isdir(target_dir):
+        raise FileNotFoundError(f"Directory '{target_dir}' does not exist.")
     now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S_%f")
+    target_file = Path(target_dir, f"backup_{now}.db")
+    tmp_file = target_file.with_name(f"{target_file.name}.tmp")
+
+    try:
+        try:
+            _copy_database(source_path, tmp_file, on_progress=on_progress, pages=pages)
+        except _BackupRestarted:
+            # keeps being written to, copy it in a single step instead
+            logger.info(f"Backup of '{source_path}' restarted too often, copying at once")
+            tmp_file.unlink(missing_ok=True)
+            _copy_database(source_path, tmp_file, on_progress=on_progress, pages=-1)
+        check_integrity(tmp_file)
+        os.replace(tmp_file, target_file)
+    except BaseException:
+        tmp_file.unlink(missing_ok=True)
+        raise
+    logger.info(f"Copy of '{source_path}' created at '{target_file}'")
+    return target_file
+
+
+class _BackupRestarted(Exception):
+    pass
+
+
+def _copy_database(
+    source_path: str,
+    target_file: Path,
+    on_progress: Callable[[int, int], None] | None,
+    pages: int,
+):
+    """Copies the database with `sqlite3.Connection.backup`, which starts over when
+    the database is written by another connection between steps.
+
+    :raises _BackupRestarted: If it started over more than `BACKUP_MAX_RESTARTS` times.
+    """
+    restarts, last_remaining = 0, None
+
+    def progress(status: int, remaining: int, total: int):
+        nonlocal restarts, last_remaining
+        if last_remaining is not None and remaining >= last_remaining:
+            restarts += 1
+            if restarts > BACKUP_MAX_RESTARTS:
+                raise _BackupRestarted
+        last_remaining = remaining
+        if on_progress:
+            on_progress(total - remaining, total)
+
+    source = sqlite3.connect(source_path)
+    try:
+        target = sqlite3.connect(target_file)
+        try:
+            source.backup(target, pages=pages, progress=progress)
+            # a copy of a WAL database is also in WAL mode, keep backups in one file
+            target.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            target.close()
+    finally:
+        source.close()
+
+
+def check_integrity(db_file: str):
+    """Runs `PRAGMA integrity_check` on the SQLite database at `db_file`.
+
+    :raises sqlite3.DatabaseError: If any problem is found.
+    """
+    # `as_uri` only accepts absolute paths
+    conn = sqlite3.connect(f"{Path(db_file).resolve().as_uri()}?mode=ro", uri=True)
     try:
-        filename = f"backup_{now}.db"
-        shutil.copyfile(src=source_path, dst=Path(target_dir, filename))
-        logger.info(f"Copy of '{source_path}' created at '{target_dir}'")
-    except FileNotFoundError as err:
-        logger.error(f"Error while copying file", exc_info=err)
+        problems = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+    finally:
+        conn.close()
+    if problems != ["ok"]:
+        raise sqlite3.DatabaseError(
+            f"Integrity check failed for '{db_file}': {'; '.join(problems)}"
+        )
 
 
 def run() -> None:
-    """Copies the database file to the local backup folder and to the folders listed in
-    the 'backup_places' option in `backup.ini`.
-    :param settings: Settings handler that will be used to read the database file's size.
+    """Backs up the database to the local backup folder and to the folders listed in
+    the 'backup_places' option in `backup.ini`, with `backup_database`. Safe to run
+    while the app is in use.
     """
+    for dirpath in [LOG_PATH, BACKUP_PATH]:
+        dirpath.mkdir(parents=True, exist_ok=True)
     backup_places: list = config.BackupPlaces.get()
     try:
         backup_places = [i for i in [BACKUP_PATH] + backup_places if i != ""]
         for place in backup_places:
             try:
-                copy_file(DB_FILE, place)
+                backup_database(DB_FILE, place)
                 logger.info(f"Succesful backup to '{place}'")
             except Exception as err:
                 logger.error(f"Could not backup to '{place}'", exc_info=err)
@@ -2,6 +2,8 @@ from sqlalchemy import (
     Column,
     Engine,
     ForeignKey,
+    Index,
+    UniqueConstraint,
     Select,
     create_engine,
     DateTime,
@@ -19,22 +21,35 @@ from sqlalchemy import (
     text,
     func,
     types,
+    event,
+    type_coerce,
+    ColumnElement,
 )
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import (
     Mapped,
     DeclarativeBase,
     relationship,
     Session,
+    sessionmaker,
 )
-from typing import List, Iterable, Literal, Any, Self, Dict
+from typing import List, Iterable, Iterator, Literal, Any, Self, Dict, Mapping
+from types import MappingProxyType
+from contextlib import contextmanager
+from contextvars import ContextVar
 from collections import namedtuple
+from itertools import batched, groupby
+from threading import Lock
+from weakref import WeakKeyDictionary
 from datetime import datetime
 from decimal import Decimal
 from pathlib import Path
 from copy import copy
 from sys import platform
-import re
+import time
 
+from flowat import config
 
 if platform == "win32":
     FLOWAT_FILES_PATH = Path.home().joinpath("AppData", "Local", "Flowat")
@@ -46,9 +61,206 @@ else:
     LOG_PATH = Path.home().joinpath(".local", "state", "Flowat", "logs")
 
 DATA_PATH = Path(FLOWAT_FILES_PATH, "data")
-DATA_PATH.mkdir(exist_ok=True)
 DB_FILE = Path(DATA_PATH, "database.db")
-DB_ENGINE = create_engine(f"sqlite:///{DB_FILE}", echo=False)
+
+SQLITE_PRAGMA_CHOICES = {
+    "journal_mode": ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"),
+    "synchronous": ("OFF", "NORMAL", "FULL", "EXTRA"),
+    "temp_store": ("DEFAULT", "FILE", "MEMORY"),
+}
+
+
+def get_sqlite_pragmas() -> Dict[str, str | int]:
+    """Pragmas applied to every new database connection, as configured in the
+    '[database]' section of 'prefs.ini'.
+
+    :raises ValueError: If a configured value is not accepted by SQLite.
+    """
+    pragmas = {
+        "journal_mode": config.DatabaseJournalMode.get(),
+        "synchronous": config.DatabaseSynchronous.get(),
+        "mmap_size": config.DatabaseMmapSize.get(),
+        "cache_size": config.DatabaseCacheSize.get(),
+        "temp_store": config.DatabaseTempStore.get(),
+        "busy_timeout": config.DatabaseBusyTimeout.get(),
+    }
+    for name, choices in SQLITE_PRAGMA_CHOICES.items():
+        if pragmas[name] not in choices:
+            raise ValueError(
+                f"Expected '{name}' in '[database]' to be one of {choices}, "
+                f"got '{pragmas[name]}'."
+            )
+    return pragmas
+
+
+def _sqlite_pragmas_listener(pragmas: Dict[str, str | int]):
+    """Listener for the engine's 'connect' event that applies `pragmas`."""
+
+    def apply_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+
+    return apply_sqlite_pragmas
+
+
+def create_db_engine(db_file: Path = DB_FILE, echo: bool = False) -> Engine:
+    """Creates an engine for the SQLite database at `db_file` that applies the
+    pragmas from `get_sqlite_pragmas` to every new connection. The pragmas are read
+    from the config once, when the engine is created.
+
+    :param db_file: Path to the database file, created on first connection.
+    :param echo: Wether the engine should log all statements.
+    :raises ValueError: If a configured pragma value is not accepted by SQLite.
+    """
+    pragmas = get_sqlite_pragmas()
+    engine = create_engine(f"sqlite:///{db_file}", echo=echo)
+    event.listen(engine, "connect", _sqlite_pragmas_listener(pragmas))
+    event.listen(engine, "connect", _disable_driver_transactions)
+    event.listen(engine, "begin", _begin_transaction)
+    return engine
+
+
+def _disable_driver_transactions(dbapi_connection, connection_record):
+    """Listener for the engine's 'connect' event. `sqlite3` only emits BEGIN before
+    writes, so SQLAlchemy takes over to make reads transactional too.
+    """
+    dbapi_connection.isolation_level = None
+
+
+def _begin_transaction(conn):
+    """Listener for the engine's 'begin' event."""
+    conn.exec_driver_sql("BEGIN")
+
+
+_default_engine: Engine | None = None
+_default_engine_lock = Lock()
+
+
+def get_engine() -> Engine:
+    """Engine of the application's database at `DB_FILE`. Created on first use,
+    along with the data directory and any missing schema object, so importing this
+    module does not touch the disk. Also available as `DB_ENGINE`.
+    """
+    global _default_engine
+    if _default_engine is None:
+        with _default_engine_lock:
+            if _default_engine is None:
+                DATA_PATH.mkdir(parents=True, exist_ok=True)
+                engine = create_db_engine(DB_FILE)
+                create_schema(engine)
+                _default_engine = engine
+    return _default_engine
+
+
+def __getattr__(name: str) -> Any:
+    if name == "DB_ENGINE":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# sessions are always bound to an engine when created
+SessionFactory = sessionmaker()
+
+_active_session: ContextVar[Session | None] = ContextVar(
+    "_active_session", default=None
+)
+
+
+@contextmanager
+def unit_of_work(engine: Engine | None = None) -> Iterator[Session]:
+    """Context manager that makes every `get_session` call for `engine` inside the
+    `with` block share one session, so all reads run on the same connection and read
+    transaction, seeing the same snapshot of the database. Nested calls reuse the
+    outer session.
+    """
+    engine = engine or get_engine()
+    active = _active_session.get()
+    if active is not None and active.get_bind() is engine:
+        yield active
+        return
+    with SessionFactory(bind=engine) as ses:
+        # reads in this session may not see writes made after this point
+        ses.info["write_generation"] = write_generation()
+        token = _active_session.set(ses)
+        try:
+            yield ses
+        finally:
+            _active_session.reset(token)
+
+
+@contextmanager
+def get_session(engine: Engine | None = None) -> Iterator[Session]:
+    """Context manager that provides the session of the current `unit_of_work` for
+    `engine`, or a new session otherwise. Should only be used for reads, writes need
+    their own session to commit.
+    """
+    engine = engine or get_engine()
+    active = _active_session.get()
+    if active is not None and active.get_bind() is engine:
+        yield active
+        return
+    with SessionFactory(bind=engine) as ses:
+        yield ses
+
+
+# WRITE TRACKING
+
+_write_generation = 0
+
+
+def write_generation() -> int:
+    """Counter of the transactions committed by any engine in this process. Any
+    cached value derived from the database is stale if this number changed since the
+    value was computed, or if `external_write_generation` changed, for writes by
+    other processes.
+    """
+    return _write_generation
+
+
+def _bump_write_generation(*args):
+    """Also the listener for the 'commit' event of every `Engine`."""
+    global _write_generation
+    _write_generation += 1
+
+
+event.listen(Engine, "commit", _bump_write_generation)
+
+
+# seconds during which `external_write_generation` does not ask SQLite again
+EXTERNAL_WRITE_CHECK_INTERVAL = 1.0
+# engine -> (time of the last check, generation)
+_external_writes: WeakKeyDictionary[Engine, tuple[float, int]] = WeakKeyDictionary()
+
+
+def external_write_generation(ses: Session) -> int:
+    """Counter of the writes to the database of the engine of `ses` committed by
+    other connections, like ones from other processes, seen through
+    `PRAGMA data_version`.
+
+    Trades freshness for fewer queries: SQLite is asked at most once every
+    `EXTERNAL_WRITE_CHECK_INTERVAL` seconds per engine, so repeated reads cost no
+    query, and writes by other processes may take that long to show.
+    """
+    engine = ses.get_bind()
+    now = time.monotonic()
+    checked_at, generation = _external_writes.get(engine, (None, 0))
+    if checked_at is not None and now - checked_at < EXTERNAL_WRITE_CHECK_INTERVAL:
+        return generation
+    # the version only compares calls on the same connection, so the last one seen
+    # is kept with it, for as long as the connection lives in the pool
+    conn = ses.connection()
+    version = conn.exec_driver_sql("PRAGMA data_version").scalar()
+    info = conn.connection.info
+    if info.get("data_version") != version:
+        # also a connection never checked, that may have missed writes
+        generation += 1
+        info["data_version"] = version
+    _external_writes[engine] = (now, generation)
+    return generation
 
 
 # DATA TYPES
@@ -82,7 +294,8 @@ class NotRequiredText(types.TypeDecorator):
 
 
 class CurrencyAmount(types.TypeDecorator):
-    impl = Numeric
+    # values are stored as integer cents, skip the Numeric -> Decimal conversion
+    impl = Numeric(asdecimal=False)
     cache_ok = True
 
     def process_bind_param(self, value, dialect):
@@ -90,7 +303,14 @@ class CurrencyAmount(types.TypeDecorator):
 
     def process_result_value(self, value, dialect):
         if value:
-            return round(Decimal(value / 100), 2)
+            return Decimal(int(value)).scaleb(-2)
+
+
+def as_cents(column: Column) -> ColumnElement[int]:
+    """Selects a `CurrencyAmount` column as the integer amount of cents stored in the
+    database, with the same name, skipping the conversion to `Decimal`.
+    """
+    return type_coerce(column, Integer).label(column.name)
 
 
 REQUIRED_TYPES = [RequiredText, Date, DateTime, CurrencyAmount]
@@ -126,53 +346,64 @@ def fmt_currency(inp: Any) -> int:
 class DeclaredTable(DeclarativeBase):
     Id = Column("Id", Integer, primary_key=True)
 
+    # column metadata of mapped subclasses, excluding `Id`, set once per class
+    _colnames: tuple[str, ...] = ()
+    _coltypes: Mapping[str, Any] = MappingProxyType({})
+    _coldefaults: Mapping[str, Any] = MappingProxyType({})
+    _display_names: Mapping[str, Any] = MappingProxyType({})
+    _required_colnames: tuple[str, ...] = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        table = getattr(cls, "__table__", None)
+        if table is None:
+            return
+        cls._colnames = tuple(name for name in table.c.keys() if name != "Id")
+        cls._coltypes = MappingProxyType(
+            {name: type(table.c[name].type) for name in cls._colnames}
+        )
+        cls._coldefaults = MappingProxyType(
+            {name: table.c[name].default for name in cls._colnames}
+        )
+        cls._display_names = MappingProxyType(
+            {name: cls._display_name(name) for name in cls._colnames}
+        )
+        cls._required_colnames = tuple(
+            name for name in cls._colnames if cls._coltypes[name] in REQUIRED_TYPES
+        )
+
     @staticmethod
     def _display_name(name: str):
         """Wrapper to generate the *display name* of any data scalar in `self.data`."""
         return name
 
-    def table_is_empty(self, engine: Engine = DB_ENGINE):
+    def table_is_empty(self, engine: Engine | None = None):
         """Static method that returns a boolean value indicating if the current table
         is empty. Should only be used by classes that inherit from
         `cashd_core.data.dec_base`.
         """
+        engine = engine or get_engine()
         table_cls = type(self)
-        with Session(engine) as ses:
+        with get_session(engine) as ses:
             stmt = select(func.count()).select_from(table_cls)
             return ses.execute(stmt).scalar() == 0
 
     @property
     def data(self) -> dict[str, Any]:
-        return {
-            colname: getattr(self, colname, None)
-            for colname in self.__table__.c.keys()
-            if colname != "Id"
-        }
+        return {colname: getattr(self, colname, None) for colname in self._colnames}
 
     @property
-    def display_names(self) -> dict[str, Any]:
-        return {
-            colname: self._display_name(colname)
-            for colname in self.__table__.c.keys()
-            if colname != "Id"
-        }
+    def display_names(self) -> Mapping[str, Any]:
+        return self._display_names
 
     @property
-    def types(self) -> dict[str, Any]:
-        return {
-            colname: type(self.__table__.c[colname].type)
-            for colname in self.__table__.c.keys()
-            if colname != "Id"
-        }
+    def types(self) -> Mapping[str, Any]:
+        return self._coltypes
 
     @property
-    def required_fieldnames(self) -> List[str]:
+    def required_fieldnames(self) -> tuple[str, ...]:
         """Names of every required fields in this table."""
-        return [
-            colname
-            for colname in self.data.keys()
-            if self.types[colname] in REQUIRED_TYPES
-        ]
+        return self._required_colnames
 
     def required_fields_are_filled(self) -> bool:
         """Returnse a boolean value indicating if all required fields for this table
@@ -180,7 +411,7 @@ class DeclaredTable(DeclarativeBase):
         """
         return all(getattr(self, col) for col in self.required_fieldnames)
 
-    def read(self, row_id: int, engine: Engine = DB_ENGINE):
+    def read(self, row_id: int, engine: Engine | None = None):
         """
         Fetches one row of data from the database and loads into this instance.
 
@@ -189,22 +420,30 @@ class DeclaredTable(DeclarativeBase):
 
         :raises ValueError: If `row_id` is not present in the table.
         """
+        engine = engine or get_engine()
         cls = type(self)
-        stmt = select(cls).where(cls.Id == row_id)
-        with Session(bind=engine) as ses:
+        # the session may be shared by a `unit_of_work` that already loaded this row
+        stmt = select(cls).where(cls.Id == row_id).execution_options(
+            populate_existing=True
+        )
+        with get_session(engine) as ses:
             res = ses.execute(stmt).first()
             if res is None:
                 raise ValueError(f"{row_id=} not present in '{self.__tablename__}.Id'.")
-            row = res[0]
-            for col in self.__table__.columns:
-                value = getattr(row, col.name, None)
-                setattr(self, col.name, value)
+            self._load(res[0])
+
+    def _load(self, row: Any):
+        """Sets every mapped column of this instance, including `Id`, from the
+        attributes of the same name in `row`.
+        """
+        for col in self.__table__.columns:
+            value = getattr(row, col.name, None)
+            setattr(self, col.name, value)
 
     def clear(self):
         """Returns all dataclass fields to their defaults, and `Id=None`."""
         self.Id = None
-        for name in self.data.keys():
-            default_value = self.__table__.c[name].default
+        for name, default_value in self._coldefaults.items():
             setattr(self, name, default_value)
 
     def fill(self, tbl_obj: Self):
@@ -213,38 +452,160 @@ class DeclaredTable(DeclarativeBase):
         for name, value in tbl_obj.data.items():
             setattr(self, name, value)
 
-    def update(self, engine: Engine = DB_ENGINE):
+    def update(self, engine: Engine | None = None):
         """If `self.Id` is defined, validates and updates the corresponding row in the
-        database with it's own values.
+        database with it's own values, then reloads them as stored.
 
         :raises AttributeError: If `self.Id` is None or not defined.
+        :raises ValueError: If `self.Id` is not present in the table.
         """
+        engine = engine or get_engine()
         if (type(self.Id) is not int) or (self.Id < 1):
             raise AttributeError(f"Expected `self.Id` to be integer, got {self.Id=}.")
         cls = type(self)
-        with Session(bind=engine) as ses:
+        row = None
+        with SessionFactory(bind=engine) as ses:
             stmt = update(cls).where(cls.Id == self.Id).values(**self.data)
-            ses.execute(stmt)
+            if engine.dialect.update_returning:
+                row = ses.execute(stmt.returning(*self.__table__.columns)).first()
+            else:
+                ses.execute(stmt)
             ses.commit()
-        self.read(row_id=self.Id, engine=engine)
-
-    def write(self, engine: Engine = DB_ENGINE):
-        """Validates and adds a new row in the database with it's own data."""
+        if row is None:
+            # SQLite older than 3.35, or no row was updated
+            self.read(row_id=self.Id, engine=engine)
+        else:
+            self._load(row)
+
+    def write(self, engine: Engine | None = None):
+        """Validates and adds a new row in the database with it's own data, then
+        reloads them as stored, including the new `Id`.
+        """
+        engine = engine or get_engine()
         cls = type(self)
-        with Session(bind=engine) as ses:
+        with SessionFactory(bind=engine) as ses:
             stmt = insert(cls).values(**self.data)
-            ses.execute(stmt)
+            if engine.dialect.insert_returning:
+                row = ses.execute(stmt.returning(*self.__table__.columns)).one()
+                ses.commit()
+                self._load(row)
+            else:
+                # SQLite older than 3.35
+                result = ses.execute(stmt)
+                ses.commit()
+                self.read(row_id=result.inserted_primary_key[0], engine=engine)
+
+    @classmethod
+    def write_many(
+        cls,
+        rows: Iterable[Self | Dict[str, Any]],
+        batch_size: int = 1000,
+        returning: bool = False,
+        engine: Engine | None = None,
+    ) -> List[int] | None:
+        """Validates and adds many rows to the database in a single transaction,
+        using one `executemany` per batch.
+
+        :param rows: Instances of this table, or dicts mapping column names to values.
+        :param batch_size: Number of rows sent to the database in each statement.
+        :param returning: If `True`, returns the `Id` of every inserted row, in the
+          same order as `rows`.
+        :param engine: `sqlalchemy.Engine` reflecting the database that will be written.
+
+        :raises sqlalchemy.exc.StatementError: If any row fails validation, in which
+          case nothing is written.
+        """
+        engine = engine or get_engine()
+        stmt = insert(cls)
+        if returning:
+            stmt = stmt.returning(cls.Id, sort_by_parameter_order=True)
+        return cls._execute_many(
+            stmt=stmt,
+            rows=rows,
+            batch_size=batch_size,
+            returning=returning,
+            engine=engine,
+        )
+
+    @classmethod
+    def upsert_many(
+        cls,
+        rows: Iterable[Self | Dict[str, Any]],
+        index_elements: Iterable[str] = ("Id",),
+        batch_size: int = 1000,
+        returning: bool = False,
+        engine: Engine | None = None,
+    ) -> List[int] | None:
+        """Same as `write_many`, but rows that conflict with an existing row on
+        `index_elements` update all other columns of that row instead.
+
+        :param index_elements: Column names of a primary key or unique index used to
+          detect conflicting rows. Rows without these values are always inserted.
+        """
+        engine = engine or get_engine()
+        index_elements = list(index_elements)
+        stmt = sqlite_insert(cls)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={
+                colname: stmt.excluded[colname]
+                for colname in cls._colnames
+                if colname not in index_elements
+            },
+        )
+        if returning:
+            stmt = stmt.returning(cls.Id, sort_by_parameter_order=True)
+        return cls._execute_many(
+            stmt=stmt,
+            rows=rows,
+            batch_size=batch_size,
+            returning=returning,
+            engine=engine,
+        )
+
+    @classmethod
+    def _execute_many(
+        cls,
+        stmt,
+        rows: Iterable[Self | Dict[str, Any]],
+        batch_size: int,
+        returning: bool,
+        engine: Engine,
+    ) -> List[int] | None:
+        """Runs `stmt` once per batch of `rows` and commits them all at once. Rows
+        with different columns than the previous row start a new batch, since a
+        single `executemany` needs the same parameters for every row.
+        """
+        ids = []
+        with SessionFactory(bind=engine) as ses:
+            for batch in batched(rows, batch_size):
+                params = [cls._row_params(row) for row in batch]
+                for _, same_keys in groupby(params, key=lambda p: p.keys()):
+                    result = ses.execute(stmt, list(same_keys))
+                    if returning:
+                        ids.extend(result.scalars().all())
             ses.commit()
+        return ids if returning else None
 
-    def delete(self, engine: Engine = DB_ENGINE):
+    @staticmethod
+    def _row_params(row: Self | Dict[str, Any]) -> Dict[str, Any]:
+        """Column values of `row`. Instances always include `Id`, `None` if not
+        defined, so a new row gets the next `Id` from the database.
+        """
+        if isinstance(row, DeclaredTable):
+            return {**row.data, "Id": row.Id}
+        return dict(row)
+
+    def delete(self, engine: Engine | None = None):
         """If `self.Id` is present in the database, attempts to delete it.
 
         :raises AttributeError: If `self.Id` is None or not defined.
         :raises sqlalchemy.exc.IntegrityError: If this deletion would leave orphaned
           foreign keys.
         """
+        engine = engine or get_engine()
         cls = type(self)
-        with Session(bind=engine) as ses:
+        with SessionFactory(bind=engine) as ses:
             stmt = delete(cls).where(cls.Id == self.Id)
             ses.execute(stmt)
             ses.commit()
@@ -259,6 +620,10 @@ class ExpenseType(DeclaredTable):
 
 class ExpenseEntry(DeclaredTable):
     __tablename__ = "expenses"
+    __table_args__ = (
+        Index("ix_expenses_TransactionDate_Id", "TransactionDate", "Id"),
+        Index("ix_expenses_IdExpenseType_TransactionDate", "IdExpenseType", "TransactionDate"),
+    )
     ExpenseTypeRelation: Mapped["ExpenseType"] = relationship(
         back_populates="ExpenseEntryRelation"
     )
@@ -289,6 +654,10 @@ class RevenueType(DeclaredTable):
 
 class RevenueEntry(DeclaredTable):
     __tablename__ = "revenues"
+    __table_args__ = (
+        Index("ix_revenues_TransactionDate_Id", "TransactionDate", "Id"),
+        Index("ix_revenues_IdRevenueType_TransactionDate", "IdRevenueType", "TransactionDate"),
+    )
     RevenueTypeRelation: Mapped["RevenueType"] = relationship(
         back_populates="RevenueEntryRelation"
     )
@@ -302,10 +671,405 @@ class RevenueEntry(DeclaredTable):
 
 class ScannedInvoiceFile(DeclaredTable):
     __tablename__ = "scanned_invoice_files"
+    __table_args__ = (
+        Index("ix_scanned_invoice_files_DocumentIdentifier", "DocumentIdentifier"),
+        Index("ix_scanned_invoice_files_IdRevenueEntry", "IdRevenueEntry"),
+    )
     ScannedRevenueEntryRelation: Mapped["RevenueEntry"] = relationship()
 
     DocumentIdentifier = Column("DocumentIdentifier", RequiredText, nullable=False)
     IdRevenueEntry: Mapped[int] = Column("IdRevenueEntry", ForeignKey("revenues.Id"))
 
 
-DeclaredTable.metadata.create_all(DB_ENGINE)
+class ImportedSalesFile(DeclaredTable):
+    """Point of sale files already read, so unchanged files are not imported twice,
+    see `flowat.data.pos`. `ModifiedTime` is in nanoseconds.
+    """
+    __tablename__ = "imported_sales_files"
+    __table_args__ = (
+        UniqueConstraint("FilePath"),
+        Index("ix_imported_sales_files_ContentHash", "ContentHash"),
+    )
+
+    FilePath = Column("FilePath", String, nullable=False)
+    FileSize = Column("FileSize", Integer, nullable=False)
+    ModifiedTime = Column("ModifiedTime", Integer, nullable=False)
+    ContentHash = Column("ContentHash", String, nullable=False)
+    ImportedAt: Mapped[datetime] = Column(DateTime(timezone=True), nullable=False)
+
+    def replace_revenues(
+        self, revenues: Iterable[Dict[str, Any]], engine: Engine | None = None
+    ) -> int:
+        """Writes this file and the `RevenueEntry` rows read from it in a single
+        transaction, deleting the revenues written from a previous version of it.
+
+        :param revenues: Column values of each `RevenueEntry`, with the name of its
+          `RevenueType` as `"RevenueType"` instead of `IdRevenueType`. Revenue types
+          that do not exist yet are created in the same transaction.
+
+        :returns: Number of revenues written.
+        :raises sqlalchemy.exc.StatementError: If any revenue fails validation, in
+          which case nothing is written, not even the new revenue types.
+        """
+        engine = engine or get_engine()
+        cls = type(self)
+        revenues = list(revenues)
+        with SessionFactory(bind=engine) as ses:
+            file_id = self.Id
+            if file_id is None:
+                stmt = insert(cls).values(**self.data).returning(cls.Id)
+                file_id = ses.execute(stmt).scalar_one()
+            else:
+                linked = select(ImportedSalesRevenue.IdRevenueEntry).where(
+                    ImportedSalesRevenue.IdImportedSalesFile == file_id
+                )
+                old_ids = ses.scalars(linked).all()
+                ses.execute(
+                    delete(ImportedSalesRevenue).where(
+                        ImportedSalesRevenue.IdImportedSalesFile == file_id
+                    )
+                )
+                for batch in batched(old_ids, 500):
+                    ses.execute(delete(RevenueEntry).where(RevenueEntry.Id.in_(batch)))
+                ses.execute(update(cls).where(cls.Id == file_id).values(**self.data))
+            type_ids = self._get_revenue_type_ids(
+                ses, {row["RevenueType"] for row in revenues}
+            )
+            params = [
+                {
+                    **{k: v for k, v in row.items() if k != "RevenueType"},
+                    "IdRevenueType": type_ids[row["RevenueType"].lower()],
+                }
+                for row in revenues
+            ]
+            if params:
+                stmt = insert(RevenueEntry).returning(
+                    RevenueEntry.Id, sort_by_parameter_order=True
+                )
+                revenue_ids = ses.execute(stmt, params).scalars().all()
+                ses.execute(
+                    insert(ImportedSalesRevenue),
+                    [
+                        {"IdImportedSalesFile": file_id, "IdRevenueEntry": revenue_id}
+                        for revenue_id in revenue_ids
+                    ],
+                )
+            ses.commit()
+        self.Id = file_id
+        return len(params)
+
+    @staticmethod
+    def _get_revenue_type_ids(ses: Session, names: set[str]) -> Dict[str, int]:
+        """Maps the lower cased `names` to the `Id` of their `RevenueType`, adding
+        the ones that do not exist yet in `ses`, without committing.
+        """
+        if not names:
+            return {}
+        type_ids = {
+            name.lower(): type_id
+            for type_id, name in ses.execute(select(RevenueType.Id, RevenueType.Name))
+        }
+        new_types = sorted(
+            {name for name in names if name.lower() not in type_ids}, key=str.lower
+        )
+        if new_types:
+            stmt = insert(RevenueType).returning(
+                RevenueType.Id, sort_by_parameter_order=True
+            )
+            new_ids = ses.execute(stmt, [{"Name": name} for name in new_types]).scalars()
+            type_ids.update(zip((name.lower() for name in new_types), new_ids))
+        return type_ids
+
+
+class ImportedSalesRevenue(DeclaredTable):
+    """Revenues written from each `ImportedSalesFile`."""
+    __tablename__ = "imported_sales_revenues"
+    __table_args__ = (
+        Index("ix_imported_sales_revenues_IdImportedSalesFile", "IdImportedSalesFile"),
+        Index("ix_imported_sales_revenues_IdRevenueEntry", "IdRevenueEntry"),
+    )
+
+    IdImportedSalesFile: Mapped[int] = Column(
+        "IdImportedSalesFile", ForeignKey("imported_sales_files.Id"), nullable=False
+    )
+    IdRevenueEntry: Mapped[int] = Column(
+        "IdRevenueEntry", ForeignKey("revenues.Id"), nullable=False
+    )
+
+
+class ExpenseMonthlySummary(DeclaredTable):
+    """Totals of expenses per month and type, maintained by triggers, see
+    `create_monthly_summaries`.
+    """
+    __tablename__ = "expense_monthly_summaries"
+    __table_args__ = (UniqueConstraint("Month", "IdExpenseType"),)
+
+    Month = Column("Month", String, nullable=False)
+    IdExpenseType = Column("IdExpenseType", Integer, nullable=False)
+    TotalValue = Column("TotalValue", Integer, nullable=False)
+    EntryCount = Column("EntryCount", Integer, nullable=False)
+
+
+class RevenueMonthlySummary(DeclaredTable):
+    """Totals of revenues per month and type, maintained by triggers, see
+    `create_monthly_summaries`. Revenues without type are summed with
+    `IdRevenueType=0`.
+    """
+    __tablename__ = "revenue_monthly_summaries"
+    __table_args__ = (UniqueConstraint("Month", "IdRevenueType"),)
+
+    Month = Column("Month", String, nullable=False)
+    IdRevenueType = Column("IdRevenueType", Integer, nullable=False)
+    TotalValue = Column("TotalValue", Integer, nullable=False)
+    EntryCount = Column("EntryCount", Integer, nullable=False)
+
+
+def create_indexes(engine: Engine | None = None):
+    """Creates the indexes declared in the mapped tables that are missing from the
+    database, `create_all` only creates them along with new tables.
+    """
+    engine = engine or get_engine()
+    for table in DeclaredTable.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+# FULL TEXT SEARCH
+
+SearchIndex = namedtuple(
+    "SearchIndex", ["Name", "Table", "TypeTable", "TypeColumn"]
+)
+SEARCH_INDEXES = [
+    SearchIndex("expenses_fts", "expenses", "expense_types", "IdExpenseType"),
+    SearchIndex("revenues_fts", "revenues", "revenue_types", "IdRevenueType"),
+]
+
+
+def _search_index_value(row: str) -> str:
+    """SQL of the indexed `TransactionValue` of `row`, both as stored, like
+    "1234.56", and as displayed by `fmt.format_cents`, like "1 234,56", so searches
+    for the value typed either way match.
+    """
+    value = f"{row}.TransactionValue"
+    return f"""
+        printf('%.2f', {value} / 100.0) || ' '
+        || CASE WHEN {value} < 0 THEN '-' ELSE '' END
+        || replace(printf('%,d', abs({value}) / 100), ',', ' ')
+        || ',' || printf('%02d', abs({value}) % 100)
+    """
+
+
+_SEARCH_INDEX_VALUES = """
+    new.Id,
+    (SELECT Name FROM {TypeTable} WHERE Id = new.{TypeColumn}),
+    new.Description,
+    new.TransactionDate,
+""" + _search_index_value("new")
+_SEARCH_INDEX_DDL = [
+    """
+    CREATE VIRTUAL TABLE {Name} USING fts5(
+        TransactionType,
+        Description,
+        TransactionDate,
+        TransactionValue,
+        prefix='2 3',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS {Name}_after_insert
+    AFTER INSERT ON {Table} BEGIN
+        INSERT INTO {Name}(
+            rowid, TransactionType, Description, TransactionDate, TransactionValue
+        )
+        VALUES (%s);
+    END
+    """ % _SEARCH_INDEX_VALUES,
+    """
+    CREATE TRIGGER IF NOT EXISTS {Name}_after_update
+    AFTER UPDATE ON {Table} BEGIN
+        DELETE FROM {Name} WHERE rowid = old.Id;
+        INSERT INTO {Name}(
+            rowid, TransactionType, Description, TransactionDate, TransactionValue
+        )
+        VALUES (%s);
+    END
+    """ % _SEARCH_INDEX_VALUES,
+    """
+    CREATE TRIGGER IF NOT EXISTS {Name}_after_delete
+    AFTER DELETE ON {Table} BEGIN
+        DELETE FROM {Name} WHERE rowid = old.Id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS {Name}_after_type_update
+    AFTER UPDATE OF Name ON {TypeTable} BEGIN
+        UPDATE {Name} SET TransactionType = new.Name
+        WHERE rowid IN (SELECT Id FROM {Table} WHERE {TypeColumn} = new.Id);
+    END
+    """,
+]
+_SEARCH_INDEX_POPULATE = """
+    INSERT INTO {Name}(
+        rowid, TransactionType, Description, TransactionDate, TransactionValue
+    )
+    SELECT
+        t.Id,
+        types.Name,
+        t.Description,
+        t.TransactionDate,
+        %s
+    FROM {Table} AS t
+    LEFT JOIN {TypeTable} AS types ON types.Id = t.{TypeColumn}
+""" % _search_index_value("t")
+
+
+def create_search_indexes(engine: Engine | None = None) -> bool:
+    """Creates the FTS5 tables in `SEARCH_INDEXES`, filled with the current ledger
+    data and kept in sync by triggers. Returns `False` if this SQLite build does not
+    support FTS5, in which case searches fall back to `LIKE` queries.
+    """
+    engine = engine or get_engine()
+    with engine.begin() as conn:
+        existing = set(
+            conn.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+            ).scalars()
+        )
+        for index in SEARCH_INDEXES:
+            fields = index._asdict()
+            create_table, *triggers = [ddl.format(**fields) for ddl in _SEARCH_INDEX_DDL]
+            if index.Name not in existing:
+                try:
+                    conn.exec_driver_sql(create_table)
+                except OperationalError:
+                    return False
+                conn.exec_driver_sql(_SEARCH_INDEX_POPULATE.format(**fields))
+            for trigger in triggers:
+                conn.exec_driver_sql(trigger)
+    return True
+
+
+def has_search_index(name: str, engine: Engine | None = None) -> bool:
+    """Indicates if the FTS5 table `name` exists in the database."""
+    engine = engine or get_engine()
+    stmt = text(
+        "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name = :name"
+    )
+    with get_session(engine) as ses:
+        return ses.execute(stmt, {"name": name}).scalar() > 0
+
+
+# MONTHLY SUMMARIES
+
+MonthlySummary = namedtuple("MonthlySummary", ["Name", "Table", "TypeColumn"])
+MONTHLY_SUMMARIES = [
+    MonthlySummary("expense_monthly_summaries", "expenses", "IdExpenseType"),
+    MonthlySummary("revenue_monthly_summaries", "revenues", "IdRevenueType"),
+]
+_MONTHLY_SUMMARY_ADD = """
+    INSERT INTO {Name}(Month, {TypeColumn}, TotalValue, EntryCount)
+    VALUES (
+        date(new.TransactionDate, 'start of month'),
+        IFNULL(new.{TypeColumn}, 0),
+        IFNULL(new.TransactionValue, 0),
+        1
+    )
+    ON CONFLICT(Month, {TypeColumn}) DO UPDATE SET
+        TotalValue = TotalValue + excluded.TotalValue,
+        EntryCount = EntryCount + 1;
+"""
+_MONTHLY_SUMMARY_SUBTRACT = """
+    UPDATE {Name} SET
+        TotalValue = TotalValue - IFNULL(old.TransactionValue, 0),
+        EntryCount = EntryCount - 1
+    WHERE Month = date(old.TransactionDate, 'start of month')
+        AND {TypeColumn} = IFNULL(old.{TypeColumn}, 0);
+    DELETE FROM {Name} WHERE EntryCount <= 0;
+"""
+_MONTHLY_SUMMARY_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS {Name}_after_insert AFTER INSERT ON {Table}
+    WHEN new.TransactionDate IS NOT NULL BEGIN %s END
+    """ % _MONTHLY_SUMMARY_ADD,
+    """
+    CREATE TRIGGER IF NOT EXISTS {Name}_after_values_update_old
+    AFTER UPDATE OF TransactionDate, TransactionValue, {TypeColumn} ON {Table}
+    WHEN old.TransactionDate IS NOT NULL BEGIN %s END
+    """ % _MONTHLY_SUMMARY_SUBTRACT,
+    """
+    CREATE TRIGGER IF NOT EXISTS {Name}_after_values_update_new
+    AFTER UPDATE OF TransactionDate, TransactionValue, {TypeColumn} ON {Table}
+    WHEN new.TransactionDate IS NOT NULL BEGIN %s END
+    """ % _MONTHLY_SUMMARY_ADD,
+    """
+    CREATE TRIGGER IF NOT EXISTS {Name}_after_delete AFTER DELETE ON {Table}
+    WHEN old.TransactionDate IS NOT NULL BEGIN %s END
+    """ % _MONTHLY_SUMMARY_SUBTRACT,
+]
+_MONTHLY_SUMMARY_REBUILD = [
+    "DELETE FROM {Name}",
+    """
+    INSERT INTO {Name}(Month, {TypeColumn}, TotalValue, EntryCount)
+    SELECT
+        date(TransactionDate, 'start of month'),
+        IFNULL({TypeColumn}, 0),
+        SUM(IFNULL(TransactionValue, 0)),
+        COUNT(*)
+    FROM {Table}
+    WHERE TransactionDate IS NOT NULL
+    GROUP BY 1, 2
+    """,
+]
+
+
+def create_monthly_summaries(engine: Engine | None = None):
+    """Creates the triggers that keep the tables in `MONTHLY_SUMMARIES` up to date,
+    and fills the tables that are empty while their ledger is not, like the ones just
+    created for an existing database.
+    """
+    engine = engine or get_engine()
+    with engine.begin() as conn:
+        for summary in MONTHLY_SUMMARIES:
+            fields = summary._asdict()
+            for trigger in _MONTHLY_SUMMARY_TRIGGERS:
+                conn.exec_driver_sql(trigger.format(**fields))
+            is_stale = conn.exec_driver_sql(
+                "SELECT NOT EXISTS (SELECT 1 FROM {Name}) "
+                "AND EXISTS (SELECT 1 FROM {Table})".format(**fields)
+            ).scalar()
+            if is_stale:
+                for stmt in _MONTHLY_SUMMARY_REBUILD:
+                    conn.exec_driver_sql(stmt.format(**fields))
+
+
+def rebuild_monthly_summaries(engine: Engine | None = None):
+    """Recomputes every table in `MONTHLY_SUMMARIES` from its ledger."""
+    engine = engine or get_engine()
+    with engine.begin() as conn:
+        for summary in MONTHLY_SUMMARIES:
+            for stmt in _MONTHLY_SUMMARY_REBUILD:
+                conn.exec_driver_sql(stmt.format(**summary._asdict()))
+
+
+def explain_query_plan(stmt: Select, engine: Engine | None = None) -> List[str]:
+    """Returns the details of each step of SQLite's query plan for `stmt`."""
+    engine = engine or get_engine()
+    compiled = stmt.compile(dialect=engine.dialect)
+    with get_session(engine) as ses:
+        result = ses.connection().exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {compiled.string}",
+            tuple(compiled.params[name] for name in compiled.positiontup),
+        )
+        return [row.detail for row in result]
+
+
+def create_schema(engine: Engine | None = None):
+    """Creates the tables, indexes, search indexes and summaries missing from the
+    database.
+    """
+    engine = engine or get_engine()
+    DeclaredTable.metadata.create_all(engine)
+    create_indexes(engine)
+    create_search_indexes(engine)
+    create_monthly_summaries(engine)
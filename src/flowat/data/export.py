@@ -0,0 +1,174 @@
+from typing import Callable, Literal
+from pathlib import Path
+import os
+
+from sqlalchemy import Engine
+
+from .db import CurrencyAmount
+from .source import _DataSource, ExpensesSource, RevenuesSource
+
+
+def export_ledger(
+    data_source: _DataSource,
+    target: str | Path,
+    file_format: Literal["csv", "parquet"] | None = None,
+    chunksize: int = 10000,
+    on_progress: Callable[[int], None] | None = None,
+) -> int:
+    """Writes every row of `data_source`, with its current search and sorting, to
+    `target`. Rows are streamed from the database and written in chunks, so memory
+    usage does not depend on the size of the ledger. Returns the number of rows
+    written.
+
+    CSV files use ';' as separator and ',' as decimal mark, with currency values in
+    R$. Parquet files keep the types of `_DataSource.iter_frames`, with currency in
+    integer cents, and require `pyarrow`.
+
+    :param data_source: Source of the rows, like `ExpensesSource`.
+    :param target: Path of the file to be written, replaced if it exists.
+    :param file_format: Format of the file, inferred from `target`'s extension if
+      not provided.
+    :param chunksize: Number of rows fetched and written at once.
+    :param on_progress: Called with the number of rows written after every chunk.
+
+    :raises ValueError: If the file format is not supported.
+    :raises ImportError: If the file format is 'parquet' and `pyarrow` is missing.
+    """
+    target = Path(target)
+    file_format = file_format or target.suffix.lstrip(".").lower()
+    match file_format:
+        case "csv":
+            write_chunks = _write_csv
+        case "parquet":
+            write_chunks = _write_parquet
+        case _:
+            raise ValueError(
+                f"Expected `file_format` to be 'csv' or 'parquet', got '{file_format}'."
+            )
+    # write to a temporary file, so a failed export never leaves a partial file
+    partial = target.with_name(f".{target.name}.partial")
+    try:
+        nrows = write_chunks(data_source, partial, chunksize, on_progress)
+        os.replace(partial, target)
+    finally:
+        partial.unlink(missing_ok=True)
+    return nrows
+
+
+def export_expenses(
+    target: str | Path,
+    search_text: str = "",
+    sort_column: str = "Id",
+    sort_ascending: bool = True,
+    engine: Engine | None = None,
+    **kwargs,
+) -> int:
+    """Exports all expenses that match `search_text`, sorted by `sort_column`, see
+    `export_ledger`. Takes the search and sorting of the source shown in the UI,
+    like `ExpensesSource.search_text`.
+    """
+    data_source = ExpensesSource(engine=engine)
+    _set_view(data_source, search_text, sort_column, sort_ascending)
+    return export_ledger(data_source, target, **kwargs)
+
+
+def export_revenues(
+    target: str | Path,
+    search_text: str = "",
+    sort_column: str = "Id",
+    sort_ascending: bool = True,
+    engine: Engine | None = None,
+    **kwargs,
+) -> int:
+    """Exports all revenues that match `search_text`, sorted by `sort_column`, see
+    `export_expenses`.
+    """
+    data_source = RevenuesSource(engine=engine)
+    _set_view(data_source, search_text, sort_column, sort_ascending)
+    return export_ledger(data_source, target, **kwargs)
+
+
+def _set_view(
+    data_source: _DataSource, search_text: str, sort_column: str, sort_ascending: bool
+):
+    """Applies the search and sorting of a source shown in the UI to `data_source`.
+
+    :raises ValueError: If `sort_column` is not a column of `data_source`.
+    """
+    data_source.search_text = search_text
+    data_source.sort_column = sort_column
+    data_source.sort_ascending = sort_ascending
+
+
+def _write_csv(
+    data_source: _DataSource,
+    target: Path,
+    chunksize: int,
+    on_progress: Callable[[int], None] | None,
+) -> int:
+    currency_colnames = _currency_colnames(data_source)
+    nrows = 0
+    with open(target, "w", encoding="utf-8", newline="") as f:
+        for frame in data_source.iter_frames(chunksize=chunksize):
+            for colname in currency_colnames:
+                frame[colname] = frame[colname] / 100
+            frame.to_csv(
+                f,
+                sep=";",
+                decimal=",",
+                float_format="%.2f",
+                index=False,
+                header=nrows == 0,
+            )
+            nrows += len(frame)
+            if on_progress:
+                on_progress(nrows)
+    if nrows == 0:
+        with open(target, "w", encoding="utf-8", newline="") as f:
+            f.write(";".join(data_source.column_names) + "\n")
+    return nrows
+
+
+def _write_parquet(
+    data_source: _DataSource,
+    target: Path,
+    chunksize: int,
+    on_progress: Callable[[int], None] | None,
+) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as err:
+        raise ImportError("Exporting to parquet requires `pyarrow`.") from err
+    nrows = 0
+    writer = None
+    try:
+        for frame in data_source.iter_frames(chunksize=chunksize):
+            for colname in data_source.CATEGORICAL_COLNAMES:
+                # categories differ between chunks, parquet dictionary-encodes them
+                frame[colname] = frame[colname].astype("string")
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(target, table.schema)
+            writer.write_table(table.cast(writer.schema))
+            nrows += len(frame)
+            if on_progress:
+                on_progress(nrows)
+        if writer is None:
+            table = pa.Table.from_pandas(
+                data_source.to_frame(chunksize=chunksize), preserve_index=False
+            )
+            pq.write_table(table, target)
+    finally:
+        if writer is not None:
+            writer.close()
+    return nrows
+
+
+def _currency_colnames(data_source: _DataSource) -> list[str]:
+    """Names of the columns of `data_source` that hold currency values."""
+    return [
+        col.name
+        for col in data_source.SELECT_STMT.selected_columns
+        if isinstance(col.type, CurrencyAmount)
+    ]
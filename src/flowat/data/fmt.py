@@ -1,8 +1,70 @@
-from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from decimal import Decimal, InvalidOperation
+from datetime import date, datetime
+from typing import Iterable
+import re
 
 from flowat import config
 
 
+def format_cents(values: Iterable[int]) -> list[str]:
+    """Formats integer amounts of cents to be displayed on the UI, like `"1 234,56"`,
+    using only integer operations.
+    """
+    formatted = []
+    for cents in values:
+        units, rest = divmod(abs(cents), 100)
+        sign = "-" if cents < 0 else ""
+        formatted.append(f"{sign}{units:_},{rest:02d}".replace("_", " "))
+    return formatted
+
+
+def text_to_cents(text: str) -> int:
+    """Converts a currency amount written as text to a signed integer amount of
+    cents, with or without `"R$"`. Accepts the Brazilian format, with `"."` between
+    thousands and `","` before the cents, like `"-1.234,56"`, and the format of OFX
+    files, like `"-1234.56"`. A single `"."` followed by 3 digits separates
+    thousands, so `"1.234"` is R$ 1 234,00. The minus sign may also come last, like
+    `"1.234,56-"`.
+
+    :raises ValueError: If `text` is not a currency amount, or has more than 2
+      decimal places, which would not fit in whole cents.
+    """
+    numeric = text.replace("R$", "").replace(" ", "")
+    sign = -1 if numeric.startswith("-") or numeric.endswith("-") else 1
+    numeric = numeric.strip("+-")
+    if _BRAZILIAN_AMOUNT.fullmatch(numeric):
+        numeric = numeric.replace(".", "").replace(",", ".")
+    elif not _DOT_DECIMAL_AMOUNT.fullmatch(numeric):
+        raise ValueError(f"Valor inválido: '{text}'")
+    return sign * int(Decimal(numeric) * 100)
+
+
+# "1234", "1234,5", "1.234", "1.234.567,89", but not "1.23" or "1,005"
+_BRAZILIAN_AMOUNT = re.compile(r"\d{1,3}(\.\d{3})+(,\d{1,2})?|\d+(,\d{1,2})?")
+# "1234.5", "1234.56"
+_DOT_DECIMAL_AMOUNT = re.compile(r"\d+\.\d{1,2}")
+
+
+def text_to_date(text: str) -> date:
+    """Converts a date written as text to a `date`, accepting the formats used in
+    bank statements and sales exports, and ignoring the time when present.
+
+    :raises ValueError: If `text` is not a date.
+    """
+    text = text.strip()
+    for date_format, length in (
+        ("%d/%m/%Y", 10),
+        ("%Y-%m-%d", 10),
+        ("%Y%m%d", 8),
+        ("%d/%m/%y", 8),
+    ):
+        try:
+            return datetime.strptime(text[:length], date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Data inválida: '{text}'")
+
+
 class _Formatter:
     def __init__(self, user_input: str, field_name: str):
         self._user_input, self._field_name = user_input, field_name
@@ -38,11 +100,7 @@ class StringToCurrency(_Formatter):
     @property
     def display_value(self) -> str:
         """Format the user input to be displayed on the UI."""
-        numeric = (
-            Decimal(self.value/100)
-            .quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-        )
-        return f"{numeric:,.2f}".replace(",", " ").replace(".", ",")
+        return format_cents([self.value])[0]
 
     @property
     def invalid_reason(self) -> str | None:
@@ -0,0 +1,239 @@
+from typing import Callable, Iterable, Iterator
+from collections import namedtuple
+from datetime import date, datetime
+from pathlib import Path
+import hashlib
+import json
+import csv
+
+from sqlalchemy import Engine, select
+
+from . import fmt
+from .db import ImportedSalesFile, get_session
+
+
+SaleLine = namedtuple("SaleLine", ["LineNumber", "Date", "PaymentType", "Value"])
+RejectedSale = namedtuple("RejectedSale", ["LineNumber", "Reason", "Line"])
+SkippedTotal = namedtuple("SkippedTotal", ["Date", "PaymentType", "Value", "Sales"])
+SalesImportResult = namedtuple(
+    "SalesImportResult", ["Path", "Status", "Sales", "Revenues", "Rejected", "Skipped"]
+)
+
+# accepted CSV header names and JSON keys of each `SaleLine` field, in lower case
+SALES_FIELDS = {
+    "Date": ("data", "date", "data da venda", "data_venda", "datahora", "timestamp"),
+    "PaymentType": (
+        "forma de pagamento",
+        "forma_pagamento",
+        "pagamento",
+        "meio de pagamento",
+        "payment",
+        "payment_type",
+    ),
+    "Value": ("valor", "valor total", "valor_total", "total", "value", "amount"),
+}
+UNKNOWN_PAYMENT_TYPE = "Não informado"
+
+
+def iter_csv_sales(path: str | Path, encoding: str = "utf-8-sig") -> Iterator[SaleLine]:
+    """Reads a CSV sales file one line at a time. The delimiter is detected from the
+    header, and the columns are found by the names in `SALES_FIELDS`.
+
+    :raises ValueError: If the file has no date or value column.
+    """
+    with open(path, "r", encoding=encoding, errors="replace", newline="") as f:
+        header = f.readline()
+        dialect = csv.Sniffer().sniff(header, delimiters=";,\t|")
+        colnames = [name.strip().lower() for name in next(csv.reader([header], dialect))]
+        positions = {}
+        for field, aliases in SALES_FIELDS.items():
+            for idx, colname in enumerate(colnames):
+                if colname in aliases:
+                    positions[field] = idx
+                    break
+        missing = {"Date", "Value"} - positions.keys()
+        if missing:
+            raise ValueError(f"Colunas não encontradas no arquivo: {sorted(missing)}.")
+        for line_number, row in enumerate(csv.reader(f, dialect), start=2):
+            if not any(cell.strip() for cell in row):
+                continue
+            values = {
+                field: row[idx].strip() if idx < len(row) else ""
+                for field, idx in positions.items()
+            }
+            yield SaleLine(
+                LineNumber=line_number,
+                Date=values["Date"],
+                PaymentType=values.get("PaymentType", ""),
+                Value=values["Value"],
+            )
+
+
+def iter_jsonl_sales(path: str | Path) -> Iterator[SaleLine | RejectedSale]:
+    """Reads a JSON lines sales file, with one object per line, one line at a time.
+    The keys are found by the names in `SALES_FIELDS`. Lines that are not JSON
+    objects are yielded as `RejectedSale`.
+    """
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                obj = json.loads(line)
+                if not isinstance(obj, dict):
+                    raise ValueError
+            except ValueError:
+                yield RejectedSale(line_number, "Linha não é um objeto JSON", line.strip())
+                continue
+            keys = {str(key).strip().lower(): key for key in obj}
+            values = {}
+            for field, aliases in SALES_FIELDS.items():
+                key = next((keys[alias] for alias in aliases if alias in keys), None)
+                values[field] = "" if key is None else str(obj[key]).strip()
+            yield SaleLine(LineNumber=line_number, **values)
+
+
+def iter_sales(path: str | Path) -> Iterator[SaleLine | RejectedSale]:
+    """Reads the sales of a CSV or JSON lines file, based on the file extension."""
+    match Path(path).suffix.lower():
+        case ".csv" | ".txt":
+            return iter_csv_sales(path)
+        case ".jsonl" | ".ndjson" | ".json":
+            return iter_jsonl_sales(path)
+        case suffix:
+            raise ValueError(f"Formato de arquivo de vendas não suportado: '{suffix}'.")
+
+
+def ingest_sales_files(
+    paths: Iterable[str | Path],
+    on_progress: Callable[[Path, int], None] | None = None,
+    engine: Engine | None = None,
+) -> list[SalesImportResult]:
+    """Calls `ingest_sales_file` for each path, in order."""
+    return [
+        ingest_sales_file(path, on_progress=on_progress, engine=engine)
+        for path in paths
+    ]
+
+
+def ingest_sales_file(
+    path: str | Path,
+    on_progress: Callable[[Path, int], None] | None = None,
+    progress_every: int = 10000,
+    engine: Engine | None = None,
+) -> SalesImportResult:
+    """Reads the sales of a point of sale file and writes their totals per day and
+    payment type as `RevenueEntry` rows, so large files result in few revenues. Safe
+    to call from a worker thread.
+
+    Files are recorded in `ImportedSalesFile`. A file with the same size and
+    modification time as recorded is skipped without being read, and so is a file
+    with the same contents as one already imported. A file that changed replaces
+    the revenues written from its previous version.
+
+    :param on_progress: Called every `progress_every` lines with the path and the
+      number of lines read so far.
+    :param engine: `sqlalchemy.Engine` reflecting the database that will be written.
+
+    :returns: `Status` is `"imported"`, `"unchanged"` or `"duplicate"`, `Sales` and
+      `Revenues` count the sales read and the revenues written, `Rejected` has
+      the lines that could not be read, with the reason why, and `Skipped` has the
+      totals per day and payment type that were not written because refunds
+      cancel out or exceed the sales.
+    """
+    path = Path(path).resolve()
+    stat = path.stat()
+    record = _get_imported_file(FilePath=str(path), engine=engine)
+    if record is not None and (record.FileSize, record.ModifiedTime) == (
+        stat.st_size,
+        stat.st_mtime_ns,
+    ):
+        return SalesImportResult(path, "unchanged", 0, 0, [], [])
+
+    content_hash = _hash_file(path)
+    if record is None:
+        record = ImportedSalesFile(FilePath=str(path))
+    elif record.ContentHash == content_hash:
+        record.FileSize, record.ModifiedTime = stat.st_size, stat.st_mtime_ns
+        record.update(engine=engine)
+        return SalesImportResult(path, "unchanged", 0, 0, [], [])
+    record.FileSize, record.ModifiedTime = stat.st_size, stat.st_mtime_ns
+    record.ContentHash, record.ImportedAt = content_hash, datetime.now()
+
+    duplicate = _get_imported_file(ContentHash=content_hash, engine=engine)
+    if duplicate is not None and duplicate.FilePath != record.FilePath:
+        record.replace_revenues([], engine=engine)
+        return SalesImportResult(path, "duplicate", 0, 0, [], [])
+
+    totals, nsales, rejected = {}, 0, []
+    for line in iter_sales(path):
+        if isinstance(line, SaleLine):
+            try:
+                key = (fmt.text_to_date(line.Date), _get_payment_type(line))
+                value = fmt.text_to_cents(line.Value)
+            except ValueError as err:
+                rejected.append(RejectedSale(line.LineNumber, str(err), line))
+            else:
+                total, count = totals.get(key, (0, 0))
+                totals[key] = (total + value, count + 1)
+                nsales += 1
+        else:
+            rejected.append(line)
+        if on_progress and line.LineNumber % progress_every == 0:
+            on_progress(path, line.LineNumber)
+
+    revenues, skipped = _get_revenues(totals)
+    nrevenues = record.replace_revenues(revenues, engine=engine)
+    return SalesImportResult(path, "imported", nsales, nrevenues, rejected, skipped)
+
+
+def _get_revenues(
+    totals: dict[tuple[date, str], tuple[int, int]],
+) -> tuple[list[dict], list[SkippedTotal]]:
+    """Rows ready for `ImportedSalesFile.replace_revenues`, which creates the revenue
+    types of payment types that do not exist yet, and the totals that are not
+    written because they are not positive, like days where refunds cancel out the
+    sales.
+    """
+    timestamp = datetime.now()
+    revenues, skipped = [], []
+    for (day, payment_type), (total, count) in sorted(totals.items()):
+        if total <= 0:
+            skipped.append(SkippedTotal(day, payment_type, total, count))
+            continue
+        revenues.append(
+            {
+                "RevenueType": payment_type,
+                "TimeStamp": timestamp,
+                "Description": f"Vendas PDV - {payment_type} ({count} vendas)",
+                "TransactionDate": day,
+                "TransactionValue": total,
+            }
+        )
+    return revenues, skipped
+
+
+def _get_imported_file(engine: Engine, **filters) -> ImportedSalesFile | None:
+    stmt = (
+        select(ImportedSalesFile)
+        .filter_by(**filters)
+        .limit(1)
+        .execution_options(populate_existing=True)
+    )
+    with get_session(engine) as ses:
+        record = ses.scalars(stmt).first()
+        if record is not None:
+            ses.expunge(record)
+        return record
+
+
+def _hash_file(path: Path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _get_payment_type(line: SaleLine) -> str:
+    return line.PaymentType.strip().title() or UNKNOWN_PAYMENT_TYPE
@@ -1,12 +1,47 @@
-from typing import Literal, Iterable
-from sqlalchemy import Engine, Select, func, select, or_, text
-from sqlalchemy.orm import Session
+from typing import Literal, Iterable, Iterator, TYPE_CHECKING
+from sqlalchemy import (
+    Engine,
+    Select,
+    func,
+    select,
+    or_,
+    text,
+    tuple_,
+    table,
+    column,
+    literal_column,
+    type_coerce,
+    String,
+    Integer,
+    Date,
+    DateTime,
+    TypeDecorator,
+)
+from datetime import date
 from copy import copy
 import re
 
-from .db import DB_ENGINE, ExpenseType, RevenueType, ExpenseEntry, RevenueEntry
+from .db import (
+    ExpenseType,
+    RevenueType,
+    ExpenseEntry,
+    RevenueEntry,
+    ExpenseMonthlySummary,
+    RevenueMonthlySummary,
+    DeclaredTable,
+    write_generation,
+    external_write_generation,
+    has_search_index,
+    get_engine,
+    get_session,
+    as_cents,
+    CurrencyAmount,
+)
 from flowat import config
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 class _DataSource:
     def __init__(
@@ -14,7 +49,10 @@ class _DataSource:
         select_stmt: Select,
         paginated: bool = True,
         search_colnames: Iterable[str] = [],
-        engine: Engine = DB_ENGINE,
+        engine: Engine | None = None,
+        pagination_mode: Literal["offset", "keyset"] = "offset",
+        search_index: str | None = None,
+        categorical_colnames: Iterable[str] = (),
     ):
         """Create a data class that interacts with the database, providing interaction
         capabilities to data widgets.
@@ -24,6 +62,17 @@ class _DataSource:
         :param paginated: Wether this data source handle pagination.
         :param search_colnames: Name of the columns where the search will be applied.
         :param engine: Engine pointing to the database where the data will be handled.
+        :param pagination_mode: How pages are fetched. `"offset"` uses
+          `LIMIT ... OFFSET`, `"keyset"` seeks from the `(sort_column, Id)` values of
+          the rows at the edges of the current page, so any page costs about the same
+          as the first one. Keyset pagination requires an `Id` column, and the sort
+          columns must not contain NULL values.
+        :param search_index: Name of a FTS5 table from `db.SEARCH_INDEXES` whose
+          rowids are the `Id` values of this source. When it exists in the database,
+          searches run as prefix `MATCH` queries on it instead of `LIKE` queries on
+          `search_colnames`.
+        :param categorical_colnames: Name of the columns with few distinct values,
+          loaded as categoricals by `to_frame` and `iter_frames`.
 
         :raises ValueError: If `searchable=True`, and `search_colnames` is an empty list,
           or if one of the selected column names are not present in the select query.
@@ -34,12 +83,23 @@ class _DataSource:
                 raise ValueError(f"Expected all `search_colnames` to be present in {
                         selected_colnames
                     }.")
+        if pagination_mode not in ("offset", "keyset"):
+            raise ValueError(
+                f"`pagination_mode` should be 'offset' or 'keyset', not '{pagination_mode}'."
+            )
+        if pagination_mode == "keyset" and "Id" not in selected_colnames:
+            raise ValueError("Keyset pagination requires an 'Id' selected column.")
         self.SEARCH_COLNAMES = search_colnames
+        self.SEARCH_INDEX = search_index
+        self.CATEGORICAL_COLNAMES = tuple(categorical_colnames)
+        self.PAGINATION_MODE = pagination_mode
         if paginated:
             self._current_page = 1
             self._rows_per_page = config.PageSize.get()
+            self._reset_keyset()
         self.SELECT_STMT = select_stmt
-        self.ENGINE = engine
+        self.ENGINE = engine or get_engine()
+        self._nrows_cache: dict[tuple[str, Select], tuple[tuple, int]] = {}
 
     @property
     def search_text(self) -> str:
@@ -52,17 +112,36 @@ class _DataSource:
     @search_text.setter
     def search_text(self, value: str):
         if self.is_searchable():
+            if str(value) != self.search_text:
+                self._reset_keyset()
             self._search_text = str(value)
 
     @property
     def nrows(self) -> int:
-        """Number of rows that should be returned by `current_data`."""
-        with Session(self.ENGINE) as ses:
+        """Number of rows that should be returned by `current_data`. The count is
+        cached until the database is written, by this process or any other, see
+        `db.write_generation` and `db.external_write_generation`, so reading it again
+        usually runs no query.
+        """
+        cache_key = (self.search_text, self.SELECT_STMT)
+        with get_session(self.ENGINE) as ses:
+            version = (
+                ses.info.get("write_generation", write_generation()),
+                external_write_generation(ses),
+            )
+            cached = self._nrows_cache.get(cache_key)
+            if cached is not None and cached[0] == version:
+                return cached[1]
             select_stmt = self._get_searched_select_stmt(
                 stmt=self.SELECT_STMT, search_text=self.search_text
             )
             nrows_stmt = select(func.count()).select_from(select_stmt.subquery())
-            return ses.execute(nrows_stmt).scalar()
+            nrows = ses.execute(nrows_stmt).scalar()
+        self._nrows_cache = {
+            key: value for key, value in self._nrows_cache.items() if value[0] == version
+        }
+        self._nrows_cache[cache_key] = (version, nrows)
+        return nrows
 
     @property
     def min_idx(self) -> int:
@@ -90,6 +169,8 @@ class _DataSource:
 
     @sort_ascending.setter
     def sort_ascending(self, value: bool):
+        if bool(value) != self.sort_ascending:
+            self._reset_keyset()
         self._sort_ascending = bool(value)
 
     @property
@@ -103,6 +184,8 @@ class _DataSource:
     @sort_column.setter
     def sort_column(self, value: str):
         if value in self.column_names:
+            if value != self.sort_column:
+                self._reset_keyset()
             self._sort_column = str(value)
         else:
             raise ValueError(
@@ -127,9 +210,11 @@ class _DataSource:
             colname=self.sort_column,
             ascending=self.sort_ascending,
         )
+        if self.is_keyset_paginated():
+            return self._get_keyset_page(stmt)
         if self.is_paginated():
             stmt = stmt.limit(self.rows_per_page).offset(self.min_idx)
-        with Session(self.ENGINE) as ses:
+        with get_session(self.ENGINE) as ses:
             return ses.execute(stmt).all()
 
     def get_data_slice(self, irange: tuple[int, int] | None = None) -> list:
@@ -144,12 +229,88 @@ class _DataSource:
                 first, last = last, first
                 reverse = True
             stmt = stmt.limit(last - first).offset(first)
-        with Session(self.ENGINE) as ses:
+        with get_session(self.ENGINE) as ses:
             result = ses.execute(stmt).all()
             if reverse:
                 return list(reversed(result))
             return result
 
+    def iter_frames(self, chunksize: int = 10000) -> Iterator["pd.DataFrame"]:
+        """Streams every row of this source, searched and sorted but not paginated,
+        as typed `pandas.DataFrame` chunks of up to `chunksize` rows. Currency
+        columns are loaded as `int64` cents, date columns as `datetime64` and the
+        columns in `CATEGORICAL_COLNAMES` as categoricals.
+        """
+        stmt = self._get_frame_select_stmt()
+        with get_session(self.ENGINE) as ses:
+            # plain rows, without the ORM loading overhead
+            result = ses.connection().execute(
+                stmt, execution_options={"yield_per": chunksize}
+            )
+            columns = list(result.keys())
+            for rows in result.partitions():
+                yield self._get_typed_frame(rows, columns=columns)
+
+    def to_frame(self, chunksize: int = 10000) -> "pd.DataFrame":
+        """Same as `iter_frames`, but returns all rows in a single data frame.
+
+        :param chunksize: Number of rows fetched from the database at once.
+        """
+        import pandas as pd
+
+        frames = list(self.iter_frames(chunksize=chunksize))
+        if not frames:
+            return self._get_typed_frame([], columns=self.column_names)
+        frame = pd.concat(frames, ignore_index=True)
+        # chunks with different categories are concatenated as objects
+        for colname in self.CATEGORICAL_COLNAMES:
+            frame[colname] = frame[colname].astype("category")
+        return frame
+
+    def _get_frame_select_stmt(self) -> Select:
+        """Searched and sorted `self.SELECT_STMT`, selecting the values as stored in
+        the database: currency columns as cents and dates as ISO strings, that are
+        converted in bulk by `_get_typed_frame`.
+        """
+        stmt = self._get_searched_select_stmt(
+            stmt=self.SELECT_STMT, search_text=self.search_text
+        )
+        stmt = self._get_sorted_select_stmt(
+            stmt=stmt,
+            colname=self.sort_column,
+            ascending=self.sort_ascending,
+        )
+        columns = []
+        for col in stmt.selected_columns:
+            if isinstance(col.type, CurrencyAmount):
+                col = as_cents(col)
+            elif isinstance(col.type, (Date, DateTime)):
+                col = type_coerce(col, String).label(col.name)
+            elif isinstance(col.type, TypeDecorator):
+                col = type_coerce(col, col.type.impl_instance).label(col.name)
+            columns.append(col)
+        return stmt.with_only_columns(*columns)
+
+    def _get_typed_frame(self, rows: list, columns: Iterable[str]) -> "pd.DataFrame":
+        """Builds a data frame from rows of `_get_frame_select_stmt`, with the column
+        types of `iter_frames`.
+        """
+        import pandas as pd
+
+        frame = pd.DataFrame.from_records(rows, columns=list(columns))
+        for colname in frame.columns:
+            coltype = self.SELECT_STMT.selected_columns[colname].type
+            series = frame[colname]
+            if isinstance(coltype, (Date, DateTime)):
+                frame[colname] = pd.to_datetime(series, format="ISO8601")
+            elif isinstance(coltype, (Integer, CurrencyAmount)):
+                frame[colname] = series.astype(
+                    "Int64" if series.isna().any() else "int64"
+                )
+            elif colname in self.CATEGORICAL_COLNAMES:
+                frame[colname] = series.astype("category")
+        return frame
+
     def is_paginated(self) -> bool:
         try:
             _ = self._current_page
@@ -157,12 +318,11 @@ class _DataSource:
         except AttributeError:
             return False
 
+    def is_keyset_paginated(self) -> bool:
+        return self.is_paginated() and self.PAGINATION_MODE == "keyset"
+
     def is_searchable(self) -> bool:
-        try:
-            _ = self._search_text
-            return True
-        except AttributeError:
-            return False
+        return len(self.SEARCH_COLNAMES) > 0 or self.SEARCH_INDEX is not None
 
     def _get_searched_select_stmt(self, stmt: Select, search_text: str = "") -> Select:
         """If this is a searchable data source, adds a search logic to `stmt` and
@@ -174,14 +334,36 @@ class _DataSource:
         """
         stmt_copy = copy(stmt)
         keywords = re.findall(r"\w+", search_text)
+        if keywords and self._uses_search_index():
+            # every keyword must be the prefix of a token in any indexed column
+            match = " ".join(f'"{kw}"*' for kw in keywords)
+            index = table(self.SEARCH_INDEX, column("rowid"))
+            matching_ids = select(index.c.rowid).where(
+                literal_column(self.SEARCH_INDEX).op("MATCH")(match)
+            )
+            return stmt_copy.where(
+                self.SELECT_STMT.selected_columns["Id"].in_(matching_ids)
+            )
         for kw in keywords:
             kw_in_cols = [
-                self.SELECT_STMT.selected_columns[col].ilike(f"%{kw}%")
+                type_coerce(self.SELECT_STMT.selected_columns[col], String).ilike(
+                    f"%{kw}%"
+                )
                 for col in self.SEARCH_COLNAMES
             ]
             stmt_copy = stmt_copy.where(or_(*kw_in_cols))
         return stmt_copy
 
+    def _uses_search_index(self) -> bool:
+        """Indicates if searches should use the FTS5 table `self.SEARCH_INDEX`."""
+        if not hasattr(self, "_search_index_exists"):
+            self._search_index_exists = (
+                self.SEARCH_INDEX is not None
+                and "Id" in self.column_names
+                and has_search_index(self.SEARCH_INDEX, engine=self.ENGINE)
+            )
+        return self._search_index_exists
+
     def _get_sorted_select_stmt(
         self, stmt: Select, colname: str, ascending: bool = True
     ) -> Select:
@@ -196,11 +378,63 @@ class _DataSource:
         self.sort_column = colname
         sortby = [
             col for col in stmt_copy.selected_columns if col.name == self.sort_column
-        ][0]
+        ]
+        if self.sort_column != "Id" and "Id" in self.column_names:
+            # tie-breaker, keeps the order of rows with equal values deterministic
+            sortby.append(stmt_copy.selected_columns["Id"])
         return stmt_copy.order_by(
-            sortby.asc() if self.sort_ascending else sortby.desc()
+            *(col.asc() if self.sort_ascending else col.desc() for col in sortby)
         )
 
+    def _get_keyset_columns(self) -> list:
+        """Columns that identify the position of a row in the current sort order."""
+        cols = self.SELECT_STMT.selected_columns
+        if self.sort_column == "Id":
+            return [cols["Id"]]
+        return [cols[self.sort_column], cols["Id"]]
+
+    def _get_row_key(self, row) -> tuple:
+        """Values of the keyset columns in `row`."""
+        if self.sort_column == "Id":
+            return (row.Id,)
+        return (getattr(row, self.sort_column), row.Id)
+
+    def _get_keyset_page(self, stmt: Select) -> list:
+        """Fetches the current page seeking from the row key around it, instead of
+        skipping every previous row with `OFFSET`.
+
+        :param stmt: Searched and sorted select statement.
+        """
+        # read first, a new page size returns to the first page
+        rows_per_page = self.rows_per_page
+        seek, key = self._keyset_anchor
+        keyset = tuple_(*self._get_keyset_columns())
+        forward = seek != "before"
+        if seek == "after":
+            stmt = stmt.where(keyset > key if self.sort_ascending else keyset < key)
+        elif seek == "before":
+            stmt = stmt.where(keyset < key if self.sort_ascending else keyset > key)
+            # walk backwards from the anchor, rows are put back in order below
+            stmt = stmt.order_by(None).order_by(
+                *(
+                    col.desc() if self.sort_ascending else col.asc()
+                    for col in self._get_keyset_columns()
+                )
+            )
+        stmt = stmt.limit(rows_per_page)
+        with get_session(self.ENGINE) as ses:
+            result = ses.execute(stmt).all()
+        if not forward:
+            result.reverse()
+        return result
+
+    def _reset_keyset(self):
+        """Returns keyset pagination to the first page."""
+        if not self.is_keyset_paginated():
+            return
+        self._current_page = 1
+        self._keyset_anchor = (None, None)
+
     @property
     def current_page(self) -> int:
         """Current page number."""
@@ -210,8 +444,15 @@ class _DataSource:
 
     @property
     def rows_per_page(self) -> int:
-        """Maximum number of rows per page in any datasource."""
-        return config.PageSize.get()
+        """Maximum number of rows per page in any datasource. When it changes, the
+        pagination returns to the first page.
+        """
+        rows_per_page = config.PageSize.get()
+        if self.is_paginated() and rows_per_page != self._rows_per_page:
+            self._rows_per_page = rows_per_page
+            self._current_page = 1
+            self._reset_keyset()
+        return rows_per_page
 
     def fetch_next_page(self):
         """Advances one page and update `current_data`. Does nothing if already
@@ -219,6 +460,12 @@ class _DataSource:
         """
         if self.max_idx == self.nrows:
             return
+        if self.is_keyset_paginated():
+            # the anchor comes from the rows of the current page as they are now
+            rows = self.current_data
+            if not rows:
+                return
+            self._keyset_anchor = ("after", self._get_row_key(rows[-1]))
         self._current_page = self._current_page + 1
 
     def fetch_previous_page(self):
@@ -227,17 +474,23 @@ class _DataSource:
         """
         if self._current_page == 1:
             return
+        if self.is_keyset_paginated():
+            rows = self.current_data
+            if self._current_page == 2 or not rows:
+                # first page always starts from the top, including new rows
+                self._reset_keyset()
+                return
+            self._keyset_anchor = ("before", self._get_row_key(rows[0]))
         self._current_page = self._current_page - 1
 
     def update_date_format(self, date_freq: Literal["m", "w", "d"]):
         """Updates `self.SELECT_STMT` to reflect the date frequency requested. Does
         nothing if the data source can't accept date frequency updates.
         """
-        raise NotImplementedError()
 
 
 class ExpenseTypeSource(_DataSource):
-    def __init__(self, engine: Engine = DB_ENGINE):
+    def __init__(self, engine: Engine | None = None):
         super().__init__(
             select_stmt=select(ExpenseType.Id, ExpenseType.Name),
             paginated=False,
@@ -246,7 +499,7 @@ class ExpenseTypeSource(_DataSource):
 
 
 class RevenueTypeSource(_DataSource):
-    def __init__(self, engine: Engine = DB_ENGINE):
+    def __init__(self, engine: Engine | None = None):
         super().__init__(
             select_stmt=select(RevenueType.Id, RevenueType.Name),
             paginated=False,
@@ -255,13 +508,22 @@ class RevenueTypeSource(_DataSource):
 
 
 class ExpensesSource(_DataSource):
-    def __init__(self, engine: Engine = DB_ENGINE):
+    def __init__(self, engine: Engine | None = None, raw_cents: bool = False):
+        """Paginated and searchable source of expenses.
+
+        :param raw_cents: If `True`, `TransactionValue` is returned as the integer
+          amount of cents instead of `Decimal`, see `fmt.format_cents`.
+        """
         stmt = select(
             ExpenseEntry.Id,
             ExpenseType.Name.label("TransactionType"),
             ExpenseEntry.Description,
             ExpenseEntry.TransactionDate,
-            ExpenseEntry.TransactionValue,
+            (
+                as_cents(ExpenseEntry.TransactionValue)
+                if raw_cents
+                else ExpenseEntry.TransactionValue
+            ),
         ).join(ExpenseEntry, ExpenseEntry.IdExpenseType == ExpenseType.Id)
         super().__init__(
             select_stmt=stmt,
@@ -273,4 +535,152 @@ class ExpensesSource(_DataSource):
                 "TransactionValue",
             ],
             engine=engine,
+            pagination_mode="keyset",
+            search_index="expenses_fts",
+            categorical_colnames=["TransactionType"],
+        )
+
+
+class RevenuesSource(_DataSource):
+    def __init__(self, engine: Engine | None = None, raw_cents: bool = False):
+        """Paginated and searchable source of revenues, including the ones without
+        type. Uses offset pagination, since revenue dates may be empty.
+
+        :param raw_cents: If `True`, `TransactionValue` is returned as the integer
+          amount of cents instead of `Decimal`, see `fmt.format_cents`.
+        """
+        stmt = select(
+            RevenueEntry.Id,
+            RevenueType.Name.label("TransactionType"),
+            RevenueEntry.Description,
+            RevenueEntry.TransactionDate,
+            (
+                as_cents(RevenueEntry.TransactionValue)
+                if raw_cents
+                else RevenueEntry.TransactionValue
+            ),
+        ).outerjoin(RevenueType, RevenueEntry.IdRevenueType == RevenueType.Id)
+        super().__init__(
+            select_stmt=stmt,
+            paginated=True,
+            search_colnames=[
+                "TransactionType",
+                "Description",
+                "TransactionDate",
+                "TransactionValue",
+            ],
+            engine=engine,
+            search_index="revenues_fts",
+            categorical_colnames=["TransactionType"],
+        )
+
+
+class _PeriodTotalsSource(_DataSource):
+    MONTH_ABBRS = (
+        "Jan", "Fev", "Mar", "Abr", "Mai", "Jun",
+        "Jul", "Ago", "Set", "Out", "Nov", "Dez",
+    )
+
+    def __init__(
+        self,
+        entry_table: type[DeclaredTable],
+        summary_table: type[DeclaredTable],
+        date_freq: Literal["m", "w", "d"] = "m",
+        engine: Engine | None = None,
+    ):
+        """Data source with the sum of `TransactionValue` of `entry_table` per period
+        of `TransactionDate`, aggregated by the database. Selects `Period`, the first
+        day of each period as an ISO date string, and `Total`, in cents.
+
+        :param entry_table: Mapped ledger table with `TransactionDate` and
+          `TransactionValue` columns.
+        :param summary_table: Monthly summary of `entry_table`, used instead of it
+          for monthly totals.
+        :param date_freq: Length of each period, `"m"` for months, `"w"` for weeks
+          starting on mondays, and `"d"` for days.
+        """
+        self.ENTRY_TABLE = entry_table
+        self.SUMMARY_TABLE = summary_table
+        self.DATE_FREQ = date_freq
+        super().__init__(
+            select_stmt=self._get_period_select_stmt(date_freq),
+            paginated=False,
+            engine=engine,
+        )
+
+    def _get_period_select_stmt(self, date_freq: Literal["m", "w", "d"]) -> Select:
+        """Select statement with the totals of each `date_freq` period.
+
+        :raises ValueError: If `date_freq` is not one of 'm', 'w' or 'd'.
+        """
+        transaction_date = self.ENTRY_TABLE.TransactionDate
+        match date_freq:
+            case "m":
+                # few rows per month, already aggregated by triggers
+                month = self.SUMMARY_TABLE.Month
+                return select(
+                    month.label("Period"),
+                    func.sum(self.SUMMARY_TABLE.TotalValue).label("Total"),
+                ).group_by(month)
+            case "w":
+                period = func.date(transaction_date, "weekday 0", "-6 days")
+            case "d":
+                period = func.date(transaction_date)
+            case _:
+                raise ValueError(
+                    f"`date_freq` should be one of 'm', 'w', 'd', not '{date_freq}'."
+                )
+        total = func.sum(type_coerce(self.ENTRY_TABLE.TransactionValue, Integer))
+        return (
+            select(period.label("Period"), total.label("Total"))
+            .where(transaction_date.is_not(None))
+            .group_by(period)
+        )
+
+    def update_date_format(self, date_freq: Literal["m", "w", "d"]):
+        """Updates `self.SELECT_STMT` to reflect the date frequency requested."""
+        self.SELECT_STMT = self._get_period_select_stmt(date_freq)
+        self.DATE_FREQ = date_freq
+
+    def plot_data(self, n_periods: int = 5) -> tuple[list[str], list[float]]:
+        """Labels and totals, in currency units, of the last `n_periods` periods with
+        data, ready to be used by `plot.bar.colplot`.
+        """
+        period = self.SELECT_STMT.selected_columns["Period"]
+        stmt = self.SELECT_STMT.order_by(period.desc()).limit(n_periods)
+        with get_session(self.ENGINE) as ses:
+            rows = ses.execute(stmt).all()
+        rows.reverse()
+        labels = [self._period_label(date.fromisoformat(r.Period)) for r in rows]
+        totals = [r.Total / 100 for r in rows]
+        return labels, totals
+
+    def _period_label(self, period_start: date) -> str:
+        """Short name of the period starting at `period_start`."""
+        if self.DATE_FREQ == "m":
+            return f"{self.MONTH_ABBRS[period_start.month - 1]}. {period_start.year}"
+        return period_start.strftime("%d/%m")
+
+
+class ExpensesByPeriodSource(_PeriodTotalsSource):
+    def __init__(
+        self, date_freq: Literal["m", "w", "d"] = "m", engine: Engine | None = None
+    ):
+        super().__init__(
+            entry_table=ExpenseEntry,
+            summary_table=ExpenseMonthlySummary,
+            date_freq=date_freq,
+            engine=engine,
+        )
+
+
+class RevenuesByPeriodSource(_PeriodTotalsSource):
+    def __init__(
+        self, date_freq: Literal["m", "w", "d"] = "m", engine: Engine | None = None
+    ):
+        super().__init__(
+            entry_table=RevenueEntry,
+            summary_table=RevenueMonthlySummary,
+            date_freq=date_freq,
+            engine=engine,
         )
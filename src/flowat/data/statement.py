@@ -0,0 +1,303 @@
+from typing import Callable, Iterable, Iterator
+from collections import Counter, namedtuple
+from datetime import date, datetime
+from itertools import batched
+from pathlib import Path
+import csv
+import re
+
+from sqlalchemy import Engine, select
+
+from . import fmt
+from .db import ExpenseEntry, ExpenseType, as_cents, get_session
+from .source import ExpenseTypeSource
+from flowat import config
+
+
+StatementLine = namedtuple(
+    "StatementLine",
+    ["LineNumber", "Date", "Description", "Value", "Category", "Barcode"],
+)
+RejectedLine = namedtuple("RejectedLine", ["LineNumber", "Reason", "Line"])
+ImportResult = namedtuple(
+    "ImportResult", ["Imported", "Duplicates", "Unclassified", "Rejected"]
+)
+
+# expense type of the lines without a category, created on the first import that
+# needs it, so they can be found and reclassified later
+UNCLASSIFIED_EXPENSE_TYPE = "Não Classificado"
+
+# accepted CSV header names of each `StatementLine` field, compared in lower case
+CSV_HEADERS = {
+    "Date": ("data", "date", "vencimento", "data de vencimento"),
+    "Description": ("descrição", "descricao", "description", "histórico", "historico"),
+    "Value": ("valor", "value", "amount", "valor (r$)"),
+    "Category": ("categoria", "category", "tipo"),
+    "Barcode": ("código de barras", "codigo de barras", "barcode"),
+}
+
+
+def iter_csv_lines(path: str | Path, encoding: str = "utf-8-sig") -> Iterator[StatementLine]:
+    """Reads a CSV statement one line at a time. The delimiter is detected from the
+    header, and the columns are found by the names in `CSV_HEADERS`. Values are kept
+    as text, to be validated by `import_statement`, which rejects credits.
+
+    :raises ValueError: If the file has no date, description or value column.
+    """
+    with open(path, "r", encoding=encoding, errors="replace", newline="") as f:
+        header = f.readline()
+        dialect = csv.Sniffer().sniff(header, delimiters=";,\t|")
+        colnames = next(csv.reader([header], dialect))
+        positions = {}
+        for field, aliases in CSV_HEADERS.items():
+            for idx, colname in enumerate(colnames):
+                if colname.strip().lower() in aliases:
+                    positions[field] = idx
+                    break
+        missing = {"Date", "Description", "Value"} - positions.keys()
+        if missing:
+            raise ValueError(f"Colunas não encontradas no arquivo: {sorted(missing)}.")
+        for line_number, row in enumerate(csv.reader(f, dialect), start=2):
+            if not any(cell.strip() for cell in row):
+                continue
+            values = {
+                field: row[idx].strip() if idx < len(row) else ""
+                for field, idx in positions.items()
+            }
+            yield StatementLine(
+                LineNumber=line_number,
+                Date=values["Date"],
+                Description=values["Description"],
+                Value=values["Value"],
+                Category=values.get("Category", ""),
+                Barcode=values.get("Barcode", ""),
+            )
+
+
+def iter_ofx_lines(path: str | Path) -> Iterator[StatementLine]:
+    """Reads the debits of an OFX statement, in both SGML (OFX 1.x) and XML (OFX 2.x)
+    flavours, one transaction at a time. Credits are skipped, since they are not
+    expenses. `LineNumber` is the line where the transaction ends.
+    """
+    tag_pattern = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<\r\n]*)")
+    transaction = None
+    with open(path, "rb") as f:
+        for line_number, raw_line in enumerate(f, start=1):
+            try:
+                line = raw_line.decode("utf-8")
+            except UnicodeDecodeError:
+                line = raw_line.decode("cp1252", errors="replace")
+            for closing, tag, value in tag_pattern.findall(line):
+                tag = tag.upper()
+                if tag == "STMTTRN":
+                    if not closing:
+                        transaction = {}
+                    elif transaction is not None:
+                        if transaction.get("TRNAMT", "").startswith("-"):
+                            yield StatementLine(
+                                LineNumber=line_number,
+                                Date=transaction.get("DTPOSTED", "")[:8],
+                                Description=(
+                                    transaction.get("MEMO") or transaction.get("NAME", "")
+                                ),
+                                Value=transaction["TRNAMT"],
+                                Category="",
+                                Barcode="",
+                            )
+                        transaction = None
+                elif transaction is not None and not closing:
+                    transaction[tag] = value.strip()
+
+
+def iter_statement_lines(path: str | Path) -> Iterator[StatementLine]:
+    """Reads the lines of a CSV or OFX statement, based on the file extension."""
+    match Path(path).suffix.lower():
+        case ".ofx":
+            return iter_ofx_lines(path)
+        case ".csv" | ".txt":
+            return iter_csv_lines(path)
+        case suffix:
+            raise ValueError(f"Formato de extrato não suportado: '{suffix}'.")
+
+
+def import_statement(
+    lines: str | Path | Iterable[StatementLine],
+    batch_size: int = 2000,
+    on_progress: Callable[[int, int], None] | None = None,
+    engine: Engine | None = None,
+) -> ImportResult:
+    """Validates statement lines and writes the valid ones as `ExpenseEntry` rows,
+    one transaction per batch. Safe to call from a worker thread.
+
+    Debits are stored as positive amounts, and credits are rejected. Lines without
+    a category are filed under `UNCLASSIFIED_EXPENSE_TYPE`, while lines with a
+    category that does not exist are rejected. Lines matching an expense already in
+    the database on date, value, description and barcode are skipped, so importing
+    the same statement again, or one that overlaps it, writes nothing twice.
+
+    :param lines: Path to a CSV or OFX file, or statement lines already parsed.
+    :param batch_size: Number of lines validated and written at once.
+    :param on_progress: Called after each batch with the number of lines read and
+      the number of expenses written so far.
+    :param engine: `sqlalchemy.Engine` reflecting the database that will be written.
+
+    :returns: Number of expenses written, number of lines skipped as duplicates,
+      number of expenses written as unclassified, and the lines that were rejected
+      with the reason why.
+    """
+    if isinstance(lines, (str, Path)):
+        lines = iter_statement_lines(lines)
+    type_ids = {
+        row.Name.lower(): row.Id for row in ExpenseTypeSource(engine=engine).current_data
+    }
+    existing, loaded_dates = Counter(), set()
+    nread, nwritten, nduplicates, nunclassified, rejected = 0, 0, 0, 0, []
+    for batch in batched(lines, batch_size):
+        entries, batch_rejected = _validate_batch(batch, type_ids=type_ids)
+        new_dates = {entry["TransactionDate"] for entry in entries} - loaded_dates
+        existing.update(_load_existing_keys(new_dates, engine=engine))
+        loaded_dates |= new_dates
+        new_entries = []
+        for entry in entries:
+            key = _entry_key(entry)
+            if existing[key] > 0:
+                existing[key] -= 1
+                nduplicates += 1
+            else:
+                new_entries.append(entry)
+        unclassified = [e for e in new_entries if e["IdExpenseType"] is None]
+        if unclassified:
+            type_id = _get_unclassified_type_id(type_ids, engine=engine)
+            for entry in unclassified:
+                entry["IdExpenseType"] = type_id
+        if new_entries:
+            ExpenseEntry.write_many(new_entries, batch_size=batch_size, engine=engine)
+        nread += len(batch)
+        nwritten += len(new_entries)
+        nunclassified += len(unclassified)
+        rejected.extend(batch_rejected)
+        if on_progress:
+            on_progress(nread, nwritten)
+    return ImportResult(
+        Imported=nwritten,
+        Duplicates=nduplicates,
+        Unclassified=nunclassified,
+        Rejected=rejected,
+    )
+
+
+def save_rejected_report(rejected: Iterable[RejectedLine], path: str | Path):
+    """Writes the lines rejected by `import_statement` to a CSV file."""
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(["Linha", "Motivo", *StatementLine._fields[1:]])
+        for line in rejected:
+            writer.writerow([line.LineNumber, line.Reason, *line.Line[1:]])
+
+
+def _validate_batch(
+    batch: Iterable[StatementLine], type_ids: dict[str, int]
+) -> tuple[list[dict], list[RejectedLine]]:
+    """Splits `batch` in rows ready for `ExpenseEntry.write_many` and rejected lines.
+    Rows of lines without a category have `IdExpenseType` set to `None`.
+    """
+    max_allowed = config.MaxAllowedValue.get() * 100
+    timestamp = datetime.now()
+    entries, rejected = [], []
+    for line in batch:
+        try:
+            entry = {
+                "IdExpenseType": _get_type_id(line, type_ids),
+                "TimeStamp": timestamp,
+                "Description": _get_description(line),
+                "Barcode": _get_barcode(line),
+                "TransactionDate": fmt.text_to_date(line.Date),
+                "TransactionValue": _get_cents(line, max_allowed),
+            }
+        except ValueError as err:
+            rejected.append(RejectedLine(line.LineNumber, str(err), line))
+            continue
+        entries.append(entry)
+    return entries, rejected
+
+
+def _get_type_id(line: StatementLine, type_ids: dict[str, int]) -> int | None:
+    if not line.Category:
+        return None
+    if line.Category.lower() not in type_ids:
+        raise ValueError(f"Categoria desconhecida: '{line.Category}'")
+    return type_ids[line.Category.lower()]
+
+
+def _get_unclassified_type_id(type_ids: dict[str, int], engine: Engine | None) -> int:
+    """Id of `UNCLASSIFIED_EXPENSE_TYPE`, creating it if it does not exist yet."""
+    name = UNCLASSIFIED_EXPENSE_TYPE.lower()
+    if name not in type_ids:
+        [type_ids[name]] = ExpenseType.write_many(
+            [{"Name": UNCLASSIFIED_EXPENSE_TYPE}], returning=True, engine=engine
+        )
+    return type_ids[name]
+
+
+def _entry_key(entry: dict) -> tuple[date, int, str, str]:
+    """Identifies an expense when looking for duplicates. The description is title
+    cased as it is when stored.
+    """
+    return (
+        entry["TransactionDate"],
+        entry["TransactionValue"],
+        entry["Description"].title(),
+        entry["Barcode"] or "",
+    )
+
+
+def _load_existing_keys(
+    dates: set[date], engine: Engine | None
+) -> Iterator[tuple[date, int, str, str]]:
+    """Keys of the expenses already stored on `dates`, see `_entry_key`."""
+    if not dates:
+        return
+    stmt = select(
+        ExpenseEntry.TransactionDate,
+        as_cents(ExpenseEntry.TransactionValue),
+        ExpenseEntry.Description,
+        ExpenseEntry.Barcode,
+    )
+    with get_session(engine) as ses:
+        for batch in batched(sorted(dates), 500):
+            rows = ses.execute(stmt.where(ExpenseEntry.TransactionDate.in_(batch)))
+            for row in rows:
+                yield (
+                    row.TransactionDate,
+                    row.TransactionValue,
+                    row.Description,
+                    row.Barcode or "",
+                )
+
+
+def _get_description(line: StatementLine) -> str:
+    if not line.Description:
+        raise ValueError("'Descrição' não pode ser vazio")
+    return line.Description
+
+
+def _get_barcode(line: StatementLine) -> str | None:
+    if not line.Barcode:
+        return None
+    barcode = fmt.StringToBarcodeITF25(
+        user_input=line.Barcode.replace(" ", "").replace(".", ""),
+        field_name="Código de barras",
+    )
+    if not barcode.is_valid():
+        raise ValueError(barcode.invalid_reason)
+    return barcode.value
+
+
+def _get_cents(line: StatementLine, max_allowed: int) -> int:
+    """Positive amount of cents of a debit, which is negative in the statement."""
+    value = -fmt.text_to_cents(line.Value)
+    if value <= 0:
+        raise ValueError(f"Não é um débito: '{line.Value}'")
+    if value > max_allowed:
+        raise ValueError(f"Valor acima do permitido: '{line.Value}'")
+    return value
@@ -7,38 +7,38 @@ from toga.widgets.button import Button
 from toga.widgets.table import Table
 from toga.widgets.label import Label
 from toga.widgets.box import Box, Row, Column
-from toga.dialogs import InfoDialog
+from toga.dialogs import InfoDialog, ErrorDialog, SaveFileDialog, OpenFileDialog
 from toga.window import Window
 from toga.style import Pack
 
 from datetime import date, datetime
+from pathlib import Path
 import asyncio
 
 from .base import BaseSection
 
 from flowat.const import style, icon
-from flowat.data import db, source, fmt
-from flowat.plot.bar import colplot
+from flowat.data import db, source, fmt, export, statement
+from flowat.plot.bar import colplot, colplot_update
 from flowat.form.date import HorizontalDateForm
 from flowat.form.elem import FormField, Heading
 
 
 class ExpensesSection(BaseSection):
     SELECTED_EXPENSE = db.ExpenseEntry()
-    expenses_source = source.ExpensesSource()
-    expense_type_source = source.ExpenseTypeSource()
 
     def __init__(self, app):
         super().__init__(app=app)
+        self.expenses_source = source.ExpensesSource(raw_cents=True)
+        self.expense_type_source = source.ExpenseTypeSource()
+        self.expenses_by_period_source = source.ExpensesByPeriodSource()
         self._ensure_expense_types()
         self.plot_expense = WebView(
             style=Pack(width=style.CONTENT_WIDTH, height=160),
-            content=colplot(
-                x=["Dez. 2025", "Jan. 2026", "Fev. 2026", "Mar. 2026", "Abr. 2026"],
-                y=[24133, 23122, 12011, 954, 97],
-            ),
-            on_webview_load=self.reload_plot,
+            content=self._get_plot_content(),
         )
+        # the chart is redrawn when the data changes after this point
+        self._plot_generation = db.write_generation()
         self.date_input = HorizontalDateForm(
             id="expense_form_duedate", value=date.today()
         )
@@ -70,6 +70,12 @@ class ExpensesSection(BaseSection):
                     style=style.BIG_BUTTON,
                     on_press=self.show_form,
                 ),
+                Button(
+                    id="btn_first_import_statement",
+                    text="Importar extrato bancário",
+                    style=style.BIG_BUTTON,
+                    on_press=self.import_statement,
+                ),
                 Button(
                     id="btn_first_restore_backup",
                     text="Restaurar um backup",
@@ -82,7 +88,11 @@ class ExpensesSection(BaseSection):
             children=[
                 self.plot_expense,
                 Row(style=Pack(align_items="center"), children=[
-                    TextInput(placeholder="Pesquisa", style=Pack(margin=5, flex=1)),
+                    TextInput(
+                        placeholder="Pesquisa",
+                        style=Pack(margin=5, flex=1),
+                        on_change=self._on_search,
+                    ),
                     Button("Adic. ↓", style=style.SIMPLE_BUTTON, on_press=self.change_sorting),
                     Button(
                         text="⋮",
@@ -102,6 +112,16 @@ class ExpensesSection(BaseSection):
                     self.expenses_list_annotation,
                     Button("anterior", style=style.SIMPLE_SMALL_BUTTON),
                     Button("próximo", style=style.SIMPLE_SMALL_BUTTON),
+                    Button(
+                        "importar",
+                        style=style.SIMPLE_SMALL_BUTTON,
+                        on_press=self.import_statement,
+                    ),
+                    Button(
+                        "exportar",
+                        style=style.SIMPLE_SMALL_BUTTON,
+                        on_press=self.export_expenses,
+                    ),
                 ])
             ]
         )
@@ -164,15 +184,27 @@ class ExpensesSection(BaseSection):
             children=[self.main_container],
         )
 
-    def reload_plot(self, widget: WebView):
-        n_loads = getattr(widget, "_n_loads", 0)
-        widget._n_loads = n_loads + 1
-        if widget._n_loads % 2 == 1:
-            return
-        widget.content = colplot(
-            x=["Dez. 2025", "Jan. 2026", "Fev. 2026", "Mar. 2026", "Abr. 2026"],
-            y=[24133, 23122, 12011, 954, 297],
-        )
+    async def refresh_plot(self):
+        """Redraws the chart with the current expense totals. The new data is pushed
+        to the loaded chart in place, and the WebView content is only replaced if
+        that fails, like when the chart is drawn by a different renderer now.
+        """
+        self._plot_generation = db.write_generation()
+        labels, totals = self.expenses_by_period_source.plot_data(n_periods=5)
+        try:
+            updated = await self.plot_expense.evaluate_javascript(
+                colplot_update(x=labels, y=totals)
+            )
+        except RuntimeError:
+            # the chart could not run the update, like while still loading
+            updated = False
+        if not updated:
+            self.plot_expense.content = colplot(x=labels, y=totals)
+
+    def _get_plot_content(self) -> str:
+        """Chart with the expense totals of the last months."""
+        labels, totals = self.expenses_by_period_source.plot_data(n_periods=5)
+        return colplot(x=labels, y=totals)
 
     def add_expense(self, widget: Button):
         """Prompts to user to confirm the inserted data, in the positive case, writes
@@ -184,6 +216,83 @@ class ExpensesSection(BaseSection):
         self._refresh_displayed_data()
         self.show_main_content(widget=widget)
 
+    async def export_expenses(self, widget: Button):
+        """Asks the user for a CSV or Parquet file, and exports the expenses that
+        match the current search to it, in the current order, without blocking the UI.
+        """
+        save_dialog = SaveFileDialog(
+            "Exportar gastos",
+            suggested_filename=f"gastos_{date.today():%Y-%m-%d}.csv",
+            file_types=["csv", "parquet"],
+        )
+        path = await self._app.main_window.dialog(save_dialog)
+        if path is None:
+            return
+        try:
+            nrows = await asyncio.to_thread(
+                export.export_expenses,
+                path,
+                search_text=self.expenses_source.search_text,
+                sort_column=self.expenses_source.sort_column,
+                sort_ascending=self.expenses_source.sort_ascending,
+            )
+        except (ValueError, ImportError, OSError) as err:
+            await self._app.main_window.dialog(
+                ErrorDialog("Não foi possível exportar", str(err))
+            )
+            return
+        await self._app.main_window.dialog(
+            InfoDialog("Gastos exportados", f"{nrows} itens salvos em '{path}'.")
+        )
+
+    async def import_statement(self, widget: Button):
+        """Asks the user for a CSV or OFX bank statement, and imports its debits as
+        expenses without blocking the UI. Rejected lines are saved to a report next
+        to the statement file.
+        """
+        open_dialog = OpenFileDialog("Importar extrato", file_types=["csv", "ofx"])
+        path = await self._app.main_window.dialog(open_dialog)
+        if path is None:
+            return
+        loop = asyncio.get_running_loop()
+
+        def on_progress(nread: int, nwritten: int):
+            loop.call_soon_threadsafe(
+                setattr,
+                self.expenses_list_annotation,
+                "text",
+                f"Importando extrato: {nread} linhas lidas, {nwritten} gastos inseridos",
+            )
+
+        try:
+            result = await asyncio.to_thread(
+                statement.import_statement,
+                path,
+                on_progress=on_progress,
+            )
+        except (ValueError, OSError) as err:
+            await self._app.main_window.dialog(
+                ErrorDialog("Não foi possível importar", str(err))
+            )
+            return
+        self._refresh_displayed_data()
+        self.show_main_content(widget=widget)
+        message = f"{result.Imported} gastos importados."
+        if result.Unclassified:
+            message += (
+                f" {result.Unclassified} sem categoria, em"
+                f" '{statement.UNCLASSIFIED_EXPENSE_TYPE}'."
+            )
+        if result.Duplicates:
+            message += f" {result.Duplicates} já existentes ignorados."
+        if result.Rejected:
+            report_path = Path(path).with_name(f"{Path(path).stem}_rejeitados.csv")
+            statement.save_rejected_report(result.Rejected, report_path)
+            message += (
+                f" {len(result.Rejected)} linhas rejeitadas, detalhes em '{report_path}'."
+            )
+        await self._app.main_window.dialog(InfoDialog("Extrato importado", message))
+
     def show_form(self, widget: Button):
         """Removes currently displayed elments and show a form where the user can
         add a new expense.
@@ -222,6 +331,11 @@ class ExpensesSection(BaseSection):
             TransactionValue=value_fmt.value,
         )
 
+    def _on_search(self, widget: TextInput):
+        """Filters the displayed expenses with the text typed in the search input."""
+        self.expenses_source.search_text = widget.value
+        self._refresh_displayed_data()
+
     def _on_form_update(self, widget: TextInput):
         """Actions performed when the user interacts with any input in the expense
         form.
@@ -234,21 +348,28 @@ class ExpensesSection(BaseSection):
 
     def _refresh_displayed_data(self):
         """Refreshes data displayed in the summary section from both plot and table."""
+        # count and rows are read from the same snapshot
+        with db.unit_of_work(self.expenses_source.ENGINE):
+            current_data = self.expenses_source.current_data
+            annotation = (
+                f"{self.expenses_source.nrows} itens, "
+                f"mostrando {self.expenses_source.min_idx + 1} "
+                f"até {self.expenses_source.max_idx}"
+            )
+        values = fmt.format_cents(r.TransactionValue for r in current_data)
         self.expenses_list.data = None # winforms needs to clear before filling
         self.expenses_list.data=[
             {
                 "descrição": r.Description,
-                "valor": f"{r.TransactionValue}".replace(".", ","),
+                "valor": value,
                 "vencimento": r.TransactionDate,
                 "id": r.Id,
             }
-            for r in self.expenses_source.current_data
+            for r, value in zip(current_data, values)
         ]
-        self.expenses_list_annotation.text = (
-            f"{self.expenses_source.nrows} itens, "
-            f"mostrando {self.expenses_source.min_idx + 1} "
-            f"até {self.expenses_source.max_idx}"
-        )
+        self.expenses_list_annotation.text = annotation
+        if db.write_generation() != self._plot_generation:
+            self._app.loop.create_task(self.refresh_plot())
 
     def show_main_content(self, widget: Button):
         """Removes currently displayed elments and show a form where the user can
@@ -316,7 +437,6 @@ class ExpensesSection(BaseSection):
             "Fatura Do Cartão De Crédito",
         ]
         current_data = [r.Name for r in self.expense_type_source.current_data]
-        for categ in expense_categories:
-            if categ not in current_data:
-                et = db.ExpenseType(Name=categ)
-                et.write()
+        missing = [categ for categ in expense_categories if categ not in current_data]
+        if missing:
+            db.ExpenseType.write_many([{"Name": categ} for categ in missing])
@@ -4,13 +4,16 @@ from toga.widgets.textinput import TextInput
 from toga.widgets.button import Button
 from toga.widgets.label import Label
 from toga.widgets.box import Box, Column, Row
+from toga.dialogs import InfoDialog, ErrorDialog, OpenFileDialog
 from toga.style import Pack
 
 from datetime import date
+import asyncio
 
 from .base import BaseSection
 
 from flowat.const import icon, style
+from flowat.data import pos
 from flowat.form.elem import FormField
 from flowat.form.date import HorizontalDateForm
 
@@ -39,7 +42,11 @@ class RevenuesSection(BaseSection):
                     style=Pack(font_size=13, text_align="center", margin=(0, 0, 30, 0)),
                 ),
                 Button("Inserir primeira receita", style=style.BIG_BUTTON, on_press=self.show_form),
-                Button("Ler vendas do PDV", style=style.BIG_BUTTON),
+                Button(
+                    "Ler vendas do PDV",
+                    style=style.BIG_BUTTON,
+                    on_press=self.read_pos_sales,
+                ),
                 Button("Restaurar um backup", style=style.BIG_BUTTON)
             ],
         )
@@ -100,6 +107,45 @@ class RevenuesSection(BaseSection):
         self.main_container.style = style.MAIN_CONTAINER
         self.main_container.add(self.revenue_form)
 
+    async def read_pos_sales(self, widget: Button):
+        """Asks the user for point of sale files, and imports their sales as
+        revenues without blocking the UI. Files already imported are skipped.
+        """
+        open_dialog = OpenFileDialog(
+            "Ler vendas do PDV",
+            file_types=["csv", "jsonl", "ndjson", "json", "txt"],
+            multiple_select=True,
+        )
+        paths = await self._app.main_window.dialog(open_dialog)
+        if not paths:
+            return
+        try:
+            results = await asyncio.to_thread(pos.ingest_sales_files, paths)
+        except (ValueError, OSError) as err:
+            await self._app.main_window.dialog(
+                ErrorDialog("Não foi possível ler as vendas", str(err))
+            )
+            return
+        imported = [result for result in results if result.Status == "imported"]
+        message = (
+            f"{sum(result.Sales for result in imported)} vendas lidas de "
+            f"{len(imported)} arquivos, somadas em "
+            f"{sum(result.Revenues for result in imported)} receitas."
+        )
+        nskipped = len(results) - len(imported)
+        if nskipped:
+            message += f" {nskipped} arquivos já importados foram ignorados."
+        nrejected = sum(len(result.Rejected) for result in imported)
+        if nrejected:
+            message += f" {nrejected} linhas não puderam ser lidas."
+        nnegative = sum(len(result.Skipped) for result in imported)
+        if nnegative:
+            message += (
+                f" {nnegative} totais por dia e forma de pagamento não foram"
+                " lançados por serem zero ou negativos, com mais estornos que vendas."
+            )
+        await self._app.main_window.dialog(InfoDialog("Vendas importadas", message))
+
     def _build_layout0(self) -> Box:
         no_expense_data = True
         no_data = True
@@ -1 +1 @@
-from . import bar, base
+from . import assets, bar, base, svg
@@ -0,0 +1,93 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+
+from flowat.plot.base import (
+    PLOTLYJS_PATH,
+    bundled_plotlyjs_path,
+    ensure_plotlyjs,
+    plotlyjs_version,
+)
+
+ASSET_SERVER_HOST = "127.0.0.1"
+
+_server: ThreadingHTTPServer | None = None
+_server_lock = Lock()
+
+
+class _AssetHandler(BaseHTTPRequestHandler):
+    """Serves the assets in `self.server.assets`, a dict mapping URL paths to
+    `(content_type, etag, body)`, with headers that let the WebView cache them while
+    the app runs, since a new version of an asset has a new path.
+    """
+
+    def do_GET(self):
+        self._respond(include_body=True)
+
+    def do_HEAD(self):
+        self._respond(include_body=False)
+
+    def _respond(self, include_body: bool):
+        asset = self.server.assets.get(self.path.split("?")[0])
+        if asset is None:
+            self.send_error(404)
+            return
+        content_type, etag, body = asset
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "public, max-age=31536000")
+        self.send_header("ETag", etag)
+        self.end_headers()
+        if include_body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def plotlyjs_url() -> str:
+    """URL of `PLOTLYJS_PATH` in the local asset server, started on first use after
+    `ensure_plotlyjs`, so charts load plotly.js offline. The server listens on a
+    port chosen by the OS, so the URL changes on every run.
+    """
+    server = _get_server()
+    return f"http://{ASSET_SERVER_HOST}:{server.server_port}{server.plotlyjs_path}"
+
+
+def shutdown():
+    """Stops the local asset server, if running."""
+    global _server
+    with _server_lock:
+        if _server is not None:
+            _server.shutdown()
+            _server.server_close()
+            _server = None
+
+
+def _get_server() -> ThreadingHTTPServer:
+    global _server
+    with _server_lock:
+        if _server is None:
+            version = ensure_plotlyjs()
+            body = PLOTLYJS_PATH.read_bytes()
+            if plotlyjs_version(body) != version:
+                # replaced since `ensure_plotlyjs`, like by an older instance of the app
+                body = bundled_plotlyjs_path().read_bytes()
+            server = ThreadingHTTPServer((ASSET_SERVER_HOST, 0), _AssetHandler)
+            server.daemon_threads = True
+            server.plotlyjs_path = f"/plotly-{version}.min.js"
+            server.assets = {
+                server.plotlyjs_path: (
+                    "application/javascript; charset=utf-8",
+                    f'"{version}"',
+                    body,
+                )
+            }
+            Thread(target=server.serve_forever, name="asset-server", daemon=True).start()
+            _server = server
+    return _server
@@ -1,24 +1,51 @@
+from typing import TYPE_CHECKING
+from functools import cache
+from importlib import metadata
 from sys import platform
-import plotly.express as px
-from plotly.graph_objects import Figure
-from PIL import Image
-import urllib
-import io
-
-from flowat.plot.base import PLOTLYJS_PATH
-from flowat.const.sys import BG_COLOR, FG_COLOR
-
-
-def _set_layout(figure: Figure, y: list[float]) -> Figure:
-    ticktext = [
-        f"R$ {v/1000:.1f} mil".replace(".", ",")
-        if v >= 1000 else f"R$ {v:.2f}".replace(".", ",")
-        for v in y
-    ]
+import logging
+import json
+
+from flowat.plot.base import (
+    RENDER_CACHE,
+    BAR_COLOR,
+    CHART_ID,
+    tick_text,
+)
+from flowat.plot import assets, svg
+from flowat import config
+from flowat.const import sys as const_sys
+
+if TYPE_CHECKING:
+    from plotly.graph_objects import Figure
+
+logger = logging.getLogger(__name__)
+
+RENDERER_CHOICES = ("auto", "svg", "plotly")
+CHART_CONFIG = {"displayModeBar": False}
+# changes whenever the documents made by `_render_colplot` change, to skip old caches
+_TEMPLATE_VERSION = 1
+# replaced by `assets.plotlyjs_url` when a cached document is used, since the URL
+# changes on every run
+_PLOTLYJS_URL_PLACEHOLDER = "flowat-plotlyjs-url.js"
+
+# evaluates to `false` when the loaded document is not a plotly chart
+_UPDATE_SCRIPT = """(function () {{
+    var chart = document.getElementById("{chart_id}");
+    if (!chart || !window.Plotly) {{
+        return false;
+    }}
+    var figure = {figure};
+    Plotly.react(chart, figure.data, figure.layout, {config});
+    return true;
+}})()"""
+
+
+def _set_layout(figure: "Figure", y: list[float]) -> "Figure":
+    ticktext = [tick_text(v) for v in y]
     return figure.update_layout(
         plot_bgcolor="rgba(0, 0, 0, 0)",
         paper_bgcolor="rgba(0, 0, 0, 0)",
-        font={"color": FG_COLOR},
+        font={"color": const_sys.FG_COLOR},
         xaxis_title=None,
         xaxis={"fixedrange": True},
         yaxis_title=None,
@@ -35,21 +62,97 @@ def _set_layout(figure: Figure, y: list[float]) -> Figure:
 
 
 def colplot(x: list[str], y: list[float]) -> str:
+    """HTML document with a column chart of `y` per label in `x`, drawn by the
+    renderer chosen in the 'renderer' option of the '[plot]' section of
+    'prefs.ini'. With "auto", series up to `svg.MAX_BARS` bars are drawn as SVG,
+    and longer ones by plotly.
+
+    Charts drawn by plotly load plotly.js from `assets.plotlyjs_url`, or from the
+    plotly CDN on Android, where the WebView blocks plain HTTP. The ones with the
+    same data, theme and plotly version are reused from `RENDER_CACHE`, without
+    importing plotly.
+    """
+    if _uses_svg(n_bars=len(x)):
+        return svg.colplot(x=x, y=y)
+    key = RENDER_CACHE.key(
+        "colplot",
+        _TEMPLATE_VERSION,
+        list(x),
+        list(y),
+        const_sys.BG_COLOR,
+        const_sys.FG_COLOR,
+        platform,
+        _plotly_version(),
+    )
+    html = RENDER_CACHE.get(key)
+    if html is None:
+        html = _render_colplot(x=x, y=y)
+        RENDER_CACHE.put(key, html)
+    placeholder = f'src="{_PLOTLYJS_URL_PLACEHOLDER}"'
+    if placeholder in html:
+        html = html.replace(placeholder, f'src="{assets.plotlyjs_url()}"', 1)
+    return html
+
+
+def colplot_update(x: list[str], y: list[float]) -> str:
+    """JavaScript that redraws a chart loaded from `colplot` with new data, in
+    place, without parsing plotly.js or rebuilding the page again. Evaluates to
+    `true` if the chart was updated, or `false` if the loaded document was drawn by
+    another renderer and must be replaced by `colplot(x, y)` instead.
+    """
+    if _uses_svg(n_bars=len(x)):
+        return svg.colplot_update(x=x, y=y)
+    return _UPDATE_SCRIPT.format(
+        chart_id=CHART_ID,
+        figure=_get_figure(x=x, y=y).to_json(),
+        config=json.dumps(CHART_CONFIG),
+    )
+
+
+def _uses_svg(n_bars: int) -> bool:
+    """Whether a chart with `n_bars` bars is drawn by `svg.colplot`. A configured
+    renderer that is not one of `RENDERER_CHOICES` is logged and treated as "auto",
+    so a typo in 'prefs.ini' does not keep the charts from showing.
+    """
+    renderer = config.PlotRenderer.get()
+    if renderer not in RENDERER_CHOICES:
+        logger.warning(
+            f"Expected 'renderer' in '[plot]' to be one of {RENDERER_CHOICES}, "
+            f"got '{renderer}', using 'auto'."
+        )
+        renderer = "auto"
+    if renderer == "auto":
+        return n_bars <= svg.MAX_BARS
+    return renderer == "svg"
+
+
+@cache
+def _plotly_version() -> str:
+    """Version of plotly, read without importing it."""
+    return metadata.version("plotly")
+
+
+def _get_figure(x: list[str], y: list[float]) -> "Figure":
+    # plotly takes longer to import than the rest of the app, defer it to the first plot
+    import plotly.express as px
+
     fig = px.bar(x=x, y=y)
     fig = _set_layout(figure=fig, y=y)
-    fig.update_traces(hovertemplate=None, marker_color="#8d81ea")
+    fig.update_traces(hovertemplate=None, marker_color=BAR_COLOR)
     fig.update_yaxes(showticklabels=False, showgrid=False)
-    transparent_bg = f"document.body.style.backgroundColor = '{BG_COLOR}';"
-    if platform in ["win32", "android"]:
-        html = fig.to_html(
-            include_plotlyjs="cdn",
-            post_script=[transparent_bg],
-            config={"displayModeBar": False},
-        )
+    return fig
+
+
+def _render_colplot(x: list[str], y: list[float]) -> str:
+    fig = _get_figure(x=x, y=y)
+    transparent_bg = f"document.body.style.backgroundColor = '{const_sys.BG_COLOR}';"
+    if platform == "android":
+        include_plotlyjs = "cdn"
     else:
-        html = fig.to_html(
-            include_plotlyjs=PLOTLYJS_PATH,
-            post_script=[transparent_bg],
-            config={"displayModeBar": False},
-        )
-    return html
+        include_plotlyjs = _PLOTLYJS_URL_PLACEHOLDER
+    return fig.to_html(
+        include_plotlyjs=include_plotlyjs,
+        post_script=[transparent_bg],
+        config=CHART_CONFIG,
+        div_id=CHART_ID,
+    )
@@ -1,14 +1,152 @@
-from plotly.offline import get_plotlyjs
+from collections import OrderedDict
+from threading import Lock
 from pathlib import Path
+import importlib.util
+import hashlib
+import json
+import shutil
+import os
+import re
 
+from flowat import config
 from flowat.const.sys import FLOWAT_FILES_PATH
 
 PLOTLYJS_PATH = Path(FLOWAT_FILES_PATH, "plotly.min.js")
+RENDER_CACHE_PATH = Path(FLOWAT_FILES_PATH, "cache", "plots")
+BAR_COLOR = "#8d81ea"
+# id of the element holding the chart in documents made by this package
+CHART_ID = "flowat-chart"
 
 
-def ensure_plotlyjs():
-    if not PLOTLYJS_PATH.is_file():
-        js_content = get_plotlyjs()
-        print("Writing plotly.min.js file...")
-        with open(PLOTLYJS_PATH, "w", encoding="utf-8") as f:
-            f.write(js_content)
+def tick_text(value: float) -> str:
+    """Formats an amount in R$ to be displayed in a chart, in thousands above 1000."""
+    if value >= 1000:
+        return f"R$ {value/1000:.1f} mil".replace(".", ",")
+    return f"R$ {value:.2f}".replace(".", ",")
+
+
+def ensure_plotlyjs() -> str:
+    """Copies the plotly.js bundled with the installed plotly to `PLOTLYJS_PATH`,
+    unless the file there already has the same version. The file is replaced
+    atomically, so it is never seen half written. Does not import plotly.
+
+    :returns: Version of plotly.js.
+    :raises ModuleNotFoundError: If plotly is not installed.
+    """
+    bundled_path = bundled_plotlyjs_path()
+    version = plotlyjs_file_version(bundled_path)
+    if plotlyjs_file_version() == version:
+        return version
+    PLOTLYJS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = PLOTLYJS_PATH.with_name(f"{PLOTLYJS_PATH.name}.{os.getpid()}.tmp")
+    shutil.copyfile(bundled_path, tmp_file)
+    os.replace(tmp_file, PLOTLYJS_PATH)
+    return version
+
+
+def bundled_plotlyjs_path() -> Path:
+    """Path of the plotly.js bundled with the installed plotly, the file read by
+    `plotly.offline.get_plotlyjs`, found without importing plotly.
+
+    :raises ModuleNotFoundError: If plotly is not installed.
+    """
+    spec = importlib.util.find_spec("plotly")
+    if spec is None or not spec.submodule_search_locations:
+        raise ModuleNotFoundError("No module named 'plotly'", name="plotly")
+    return Path(spec.submodule_search_locations[0], "package_data", "plotly.min.js")
+
+
+def plotlyjs_file_version(path: Path | None = None) -> str | None:
+    """Version of the plotly.js in `path`, `PLOTLYJS_PATH` by default, read from its
+    header comment, or `None` if the file is missing or has no version.
+    """
+    try:
+        with open(path or PLOTLYJS_PATH, "rb") as f:
+            return plotlyjs_version(f.read(256))
+    except OSError:
+        return None
+
+
+def plotlyjs_version(content: bytes) -> str | None:
+    """Version of plotly.js in the header comment of `content`, or `None`."""
+    match = re.search(rb"plotly\.js v(\d+\.\d+\.\d+)", content[:256])
+    return match.group(1).decode() if match else None
+
+
+class RenderCache:
+    def __init__(
+        self, maxsize: int = 32, path: Path = RENDER_CACHE_PATH, max_files: int = 256
+    ):
+        """Cache of rendered plots, addressed by a hash of everything that affects
+        the output, see `key`. Keeps the `maxsize` most recently used plots in
+        memory, and, if enabled by the 'disk_cache' option in the '[plot]' section
+        of 'prefs.ini', up to `max_files` plots in `path`, so they survive restarts.
+        """
+        self.maxsize, self.path, self.max_files = maxsize, path, max_files
+        self._memory: OrderedDict[str, str] = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def key(*parts) -> str:
+        """Hash of `parts`, which must be JSON serializable after converting numbers
+        and other objects to `str`.
+        """
+        encoded = json.dumps(parts, default=str, ensure_ascii=False).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        """Rendered plot stored under `key`, or `None` if not cached."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        if not config.PlotDiskCache.get():
+            return None
+        try:
+            content = Path(self.path, f"{key}.html").read_text(encoding="utf-8")
+        except OSError:
+            return None
+        self._remember(key, content)
+        return content
+
+    def put(self, key: str, content: str):
+        """Stores the rendered plot `content` under `key`."""
+        self._remember(key, content)
+        if config.PlotDiskCache.get():
+            try:
+                self._write_file(key, content)
+            except OSError:
+                # the plot was rendered anyway, it will be rendered again next time
+                pass
+
+    def clear(self):
+        """Removes every cached plot, from memory and disk."""
+        with self._lock:
+            self._memory.clear()
+        for cache_file in self.path.glob("*.html"):
+            cache_file.unlink(missing_ok=True)
+
+    def _remember(self, key: str, content: str):
+        with self._lock:
+            self._memory[key] = content
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)
+
+    def _write_file(self, key: str, content: str):
+        """Writes `content` atomically, then removes the least recently written
+        files above `max_files`.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        cache_file = Path(self.path, f"{key}.html")
+        tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+        tmp_file.write_text(content, encoding="utf-8")
+        os.replace(tmp_file, cache_file)
+        cache_files = list(self.path.glob("*.html"))
+        if len(cache_files) > self.max_files:
+            cache_files.sort(key=lambda f: f.stat().st_mtime)
+            for old_file in cache_files[: len(cache_files) - self.max_files]:
+                old_file.unlink(missing_ok=True)
+
+
+RENDER_CACHE = RenderCache()
@@ -0,0 +1,105 @@
+from html import escape
+import json
+
+from flowat.plot.base import BAR_COLOR, CHART_ID, tick_text
+from flowat.const import sys as const_sys
+
+# longest series drawn as SVG when the renderer is "auto"
+MAX_BARS = 24
+# fraction of each slot left empty between bars, same as plotly's default
+BAR_GAP = 0.2
+BAR_CORNER_RADIUS = 6
+
+_DOCUMENT = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<style>
+html, body {{
+    margin: 0;
+    height: 100%;
+    overflow: hidden;
+    background-color: {bg_color};
+    color: {fg_color};
+    font: 12px "Open Sans", verdana, arial, sans-serif;
+}}
+.chart {{ display: flex; flex-direction: column; height: 100%; }}
+.chart svg {{ flex: 1; width: 100%; }}
+.chart rect {{ fill: {bar_color}; }}
+.chart rect:hover {{ opacity: 0.8; }}
+.labels {{ display: flex; }}
+.labels span {{ flex: 1; padding-top: 4px; text-align: center; white-space: nowrap; }}
+</style>
+</head>
+<body>
+<div class="chart">
+<svg id="{chart_id}-bars" xmlns="http://www.w3.org/2000/svg">{bars}</svg>
+<div id="{chart_id}-labels" class="labels">{labels}</div>
+</div>
+</body>
+</html>
+"""
+
+# evaluates to `false` when the loaded document is not a SVG chart
+_UPDATE_SCRIPT = """(function () {{
+    var bars = document.getElementById("{chart_id}-bars");
+    var labels = document.getElementById("{chart_id}-labels");
+    if (!bars || !labels) {{
+        return false;
+    }}
+    bars.innerHTML = {bars};
+    labels.innerHTML = {labels};
+    return true;
+}})()"""
+
+
+def colplot(x: list[str], y: list[float]) -> str:
+    """HTML document with a column chart of `y` per label in `x`, drawn as inline
+    SVG with the same styling as `bar.colplot`, without plotly or any script. Bars
+    are sized in percentages, so the chart fills the WebView at any size, and the
+    value of each bar shows on hover.
+    """
+    return _DOCUMENT.format(
+        bg_color=const_sys.BG_COLOR,
+        fg_color=const_sys.FG_COLOR,
+        bar_color=BAR_COLOR,
+        chart_id=CHART_ID,
+        bars=colplot_bars(x=x, y=y),
+        labels=colplot_labels(x=x),
+    )
+
+
+def colplot_update(x: list[str], y: list[float]) -> str:
+    """JavaScript that replaces the bars and labels of a chart loaded from
+    `colplot`, see `bar.colplot_update`.
+    """
+    return _UPDATE_SCRIPT.format(
+        chart_id=CHART_ID,
+        bars=json.dumps(colplot_bars(x=x, y=y)),
+        labels=json.dumps(colplot_labels(x=x)),
+    )
+
+
+def colplot_bars(x: list[str], y: list[float]) -> str:
+    """SVG elements of the bars drawn by `colplot`."""
+    if not x:
+        return ""
+    slot_width = 100 / len(x)
+    bar_width = slot_width * (1 - BAR_GAP)
+    values = [max(float(value), 0) for value in y]
+    top = max(values)
+    bars = []
+    for idx, (label, value) in enumerate(zip(x, values)):
+        height = 100 * value / top if top else 0
+        bars.append(
+            f'<rect x="{idx * slot_width + slot_width * BAR_GAP / 2:.3f}%" '
+            f'y="{100 - height:.3f}%" width="{bar_width:.3f}%" height="{height:.3f}%" '
+            f'rx="{BAR_CORNER_RADIUS}">'
+            f"<title>{escape(str(label))}: {escape(tick_text(value))}</title></rect>"
+        )
+    return "".join(bars)
+
+
+def colplot_labels(x: list[str]) -> str:
+    """HTML elements of the labels under the bars drawn by `colplot`."""
+    return "".join(f"<span>{escape(str(label))}</span>" for label in x)
@@ -0,0 +1,52 @@
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import create_engine
+
+from flowat import config
+from flowat.data import db
+
+
+@pytest.fixture
+def schema_engine(tmp_path):
+    """Engine of an empty database with the whole schema of the app, including the
+    search indexes and the monthly summary triggers.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    db.create_schema(engine)
+    return engine
+
+
+@pytest.fixture
+def ledger_engine(schema_engine):
+    """`schema_engine` with two expense types and 11 expenses, whose dates repeat
+    every 3 rows across 3 months, and whose values go from R$ 1 234,56 up.
+    """
+    type_ids = db.ExpenseType.write_many(
+        [{"Name": "Luz"}, {"Name": "Água"}], returning=True, engine=schema_engine
+    )
+    db.ExpenseEntry.write_many(
+        [
+            {
+                "IdExpenseType": type_ids[i % 2],
+                "TimeStamp": datetime(2026, 1, 1),
+                "Description": f"Conta {i} {'Luz' if i % 2 == 0 else 'Água'}",
+                "TransactionDate": date(2026, 1 + i % 3, 10),
+                "TransactionValue": 123456 * (i + 1),
+            }
+            for i in range(11)
+        ],
+        engine=schema_engine,
+    )
+    return schema_engine
+
+
+@pytest.fixture
+def page_size(monkeypatch):
+    """Sets the page size of data sources to 3 rows, returns a function to change it."""
+
+    def set_page_size(size: int):
+        monkeypatch.setattr(config.PageSize, "get", lambda: size)
+
+    set_page_size(3)
+    return set_page_size
@@ -0,0 +1,51 @@
+import sqlite3
+
+from flowat.data import backup
+
+
+def test_backup_is_consistent_while_database_is_written(tmp_path):
+    """A backup taken while another connection writes should be a complete,
+    valid database, with no temporary file left behind.
+    """
+    db_file = tmp_path / "database.db"
+    writer = sqlite3.connect(db_file)
+    writer.execute("PRAGMA journal_mode = WAL")
+    writer.execute("CREATE TABLE t (value TEXT)")
+    writer.executemany("INSERT INTO t VALUES (?)", [("x" * 500,)] * 5000)
+    writer.commit()
+
+    def write_during_backup(copied: int, total: int):
+        writer.execute("INSERT INTO t VALUES ('during')")
+        writer.commit()
+
+    target_dir = tmp_path / "backup"
+    target_dir.mkdir()
+    try:
+        backup_file = backup.backup_database(
+            db_file, target_dir, on_progress=write_during_backup, pages=64
+        )
+    finally:
+        writer.close()
+
+    assert [f.name for f in target_dir.iterdir()] == [backup_file.name]
+    backup.check_integrity(backup_file)
+    conn = sqlite3.connect(backup_file)
+    try:
+        assert conn.execute("SELECT count(*) FROM t").fetchone()[0] >= 5000
+    finally:
+        conn.close()
+
+
+def test_backup_of_relative_paths(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    conn = sqlite3.connect("database.db")
+    try:
+        conn.execute("CREATE TABLE t (value TEXT)")
+        conn.commit()
+    finally:
+        conn.close()
+    backup.check_integrity("database.db")
+
+    (tmp_path / "backup").mkdir()
+    backup_file = backup.backup_database("database.db", "backup")
+    backup.check_integrity(backup_file)
@@ -31,3 +31,75 @@ finally:
     # test cleanup
     if parser._config_file.is_file():
         parser._config_file.unlink()
+
+
+class TestConfig(config._Config):
+    __test__ = False
+    def __init__(self):
+        super().__init__(
+            parser_factory=get_test_parser,
+            section="test",
+            key="value",
+            default="default",
+        )
+
+
+def test_parser_is_cached_until_file_changes():
+    try:
+        parser = get_test_parser()
+        assert get_test_parser() is parser
+
+        # an edit by another process should be seen on the next read
+        with open(parser._config_file, "a") as f:
+            f.write("\n[other]\nkey = value\n")
+        reread = get_test_parser()
+        assert reread is not parser
+        assert reread.get("other", "key") == "value"
+    finally:
+        get_test_parser()._config_file.unlink(missing_ok=True)
+
+
+def test_set_updates_cache_and_file():
+    try:
+        assert TestConfig.get() == "default"
+        TestConfig.set("changed")
+        parser = get_test_parser()
+        assert TestConfig.get() == "changed"
+        # the write should not need the file to be parsed again
+        assert get_test_parser() is parser
+        assert "value = changed" in parser._config_file.read_text()
+        assert list(parser._config_file.parent.glob("test.ini.*.tmp")) == []
+    finally:
+        get_test_parser()._config_file.unlink(missing_ok=True)
+
+
+def test_transaction_writes_once_on_exit():
+    try:
+        with config.transaction():
+            TestConfig.set("changed")
+            TestConfigList.set(["one", "two"])
+            # changes are seen inside the transaction before being written
+            assert TestConfig.get() == "changed"
+            assert TestConfigList.get() == ["one", "two"]
+            config_file = get_test_parser()._config_file
+            assert "changed" not in config_file.read_text()
+        content = config_file.read_text()
+        assert "value = changed" in content
+        assert "one," in content
+    finally:
+        get_test_parser()._config_file.unlink(missing_ok=True)
+
+
+def test_transaction_writes_nothing_on_error():
+    try:
+        TestConfig.set("before")
+        try:
+            with config.transaction():
+                TestConfig.set("after")
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        assert TestConfig.get() == "before"
+        assert "after" not in get_test_parser()._config_file.read_text()
+    finally:
+        get_test_parser()._config_file.unlink(missing_ok=True)
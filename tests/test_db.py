@@ -0,0 +1,277 @@
+from datetime import date, datetime
+from decimal import Decimal
+import subprocess
+import sys
+import os
+
+import pytest
+from sqlalchemy import event, select, text
+
+from flowat.data import db
+
+
+def test_import_has_no_side_effects(tmp_path):
+    """Importing the data modules should not create files or the database engine,
+    so scripts that only need part of them start quickly.
+    """
+    script = (
+        "import flowat.data, flowat.data.source, flowat.data.statement, "
+        "flowat.data.pos\n"
+        "from flowat.data import db\n"
+        "assert db._default_engine is None\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        env={**os.environ, "HOME": str(tmp_path)},
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_write_many_mixed_rows_returns_ids_in_order(schema_engine):
+    """Rows with and without `Id`, as instances or dicts, are written in one call,
+    and the returned ids follow the order of the rows.
+    """
+    rows = [
+        db.ExpenseType(Name="a"),
+        db.ExpenseType(Id=10, Name="b"),
+        {"Name": "c"},
+        {"Id": 20, "Name": "d"},
+        db.ExpenseType(Name="e"),
+    ]
+    ids = db.ExpenseType.write_many(
+        rows, batch_size=2, returning=True, engine=schema_engine
+    )
+    assert ids[1] == 10 and ids[3] == 20
+    with db.get_session(schema_engine) as ses:
+        names = dict(ses.execute(select(db.ExpenseType.Id, db.ExpenseType.Name)).all())
+    assert [names[i] for i in ids] == ["A", "B", "C", "D", "E"]
+
+
+def test_upsert_many_updates_conflicts_and_returns_ids(schema_engine):
+    ids = db.ExpenseType.write_many(
+        [{"Name": "a"}, {"Name": "b"}], returning=True, engine=schema_engine
+    )
+    upserted = db.ExpenseType.upsert_many(
+        [{"Name": "new"}, {"Id": ids[1], "Name": "changed"}, db.ExpenseType(Name="x")],
+        returning=True,
+        engine=schema_engine,
+    )
+    assert upserted[1] == ids[1]
+    assert len(set(upserted)) == 3
+    with db.get_session(schema_engine) as ses:
+        names = dict(ses.execute(select(db.ExpenseType.Id, db.ExpenseType.Name)).all())
+    assert names == {ids[0]: "A", ids[1]: "Changed", upserted[0]: "New", upserted[2]: "X"}
+
+
+def test_engine_reads_pragmas_once(tmp_path, monkeypatch):
+    calls = []
+
+    def get_sqlite_pragmas():
+        calls.append(1)
+        return {"temp_store": "MEMORY", "cache_size": -1234}
+
+    monkeypatch.setattr(db, "get_sqlite_pragmas", get_sqlite_pragmas)
+    engine = db.create_db_engine(tmp_path / "pragmas.db")
+    # nested connections are checked out from the pool as new connections
+    with engine.connect() as first, engine.connect() as second:
+        for conn in (first, second):
+            assert conn.exec_driver_sql("PRAGMA temp_store").scalar() == 2
+            assert conn.exec_driver_sql("PRAGMA cache_size").scalar() == -1234
+    assert len(calls) == 1
+
+
+def _search_index_rows(engine, name="expenses_fts") -> dict:
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(
+            f"SELECT rowid, TransactionType, Description, TransactionValue FROM {name}"
+        ).all()
+    return {row[0]: tuple(row[1:]) for row in rows}
+
+
+def test_search_index_follows_ledger(ledger_engine):
+    indexed = _search_index_rows(ledger_engine)
+    assert len(indexed) == 11
+    assert indexed[1] == ("Luz", "Conta 0 Luz", "1234.56 1 234,56")
+
+    expense = db.ExpenseEntry()
+    expense.read(row_id=1, engine=ledger_engine)
+    expense.Description, expense.TransactionValue = "Conta nova", Decimal("10.5")
+    expense.update(engine=ledger_engine)
+    assert _search_index_rows(ledger_engine)[1] == ("Luz", "Conta Nova", "10.50 10,50")
+
+    expense_type = db.ExpenseType()
+    expense_type.read(row_id=1, engine=ledger_engine)
+    expense_type.Name = "Energia"
+    expense_type.update(engine=ledger_engine)
+    assert _search_index_rows(ledger_engine)[1][0] == "Energia"
+
+    expense.delete(engine=ledger_engine)
+    indexed = _search_index_rows(ledger_engine)
+    assert 1 not in indexed and len(indexed) == 10
+
+
+def test_create_search_indexes_again(ledger_engine):
+    """Creating the search indexes of a database that has them changes nothing."""
+    assert db.create_search_indexes(ledger_engine)
+    assert len(_search_index_rows(ledger_engine)) == 11
+    with ledger_engine.connect() as conn:
+        triggers = conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master "
+            "WHERE type = 'trigger' AND name LIKE 'expenses_fts%'"
+        ).scalars().all()
+    assert sorted(triggers) == [
+        "expenses_fts_after_delete",
+        "expenses_fts_after_insert",
+        "expenses_fts_after_type_update",
+        "expenses_fts_after_update",
+    ]
+
+
+def test_read_in_unit_of_work_sees_own_writes(ledger_engine):
+    """Rows already loaded in the session of a `unit_of_work` are loaded again."""
+    expense = db.ExpenseEntry()
+    with db.unit_of_work(ledger_engine) as ses:
+        # kept in the identity map of the session while referenced
+        loaded = ses.get(db.ExpenseEntry, 1)
+        expense.read(row_id=1, engine=ledger_engine)
+        assert expense.Description == loaded.Description == "Conta 0 Luz"
+        ses.execute(text("UPDATE expenses SET Description = 'Changed' WHERE Id = 1"))
+        expense.read(row_id=1, engine=ledger_engine)
+        assert expense.Description == "Changed"
+        ses.rollback()
+
+
+@pytest.mark.parametrize("returning", [True, False])
+def test_write_and_update_reload_stored_values(schema_engine, monkeypatch, returning):
+    """Written rows are reloaded as stored, through RETURNING when the database
+    supports it, without a separate SELECT.
+    """
+    monkeypatch.setattr(schema_engine.dialect, "insert_returning", returning)
+    monkeypatch.setattr(schema_engine.dialect, "update_returning", returning)
+    statements = []
+    event.listen(
+        schema_engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    expense_type = db.ExpenseType(Name="conta")
+    expense_type.write(engine=schema_engine)
+    assert expense_type.Id == 1
+    assert expense_type.Name == "Conta"
+
+    expense = db.ExpenseEntry(
+        IdExpenseType=expense_type.Id,
+        TimeStamp=datetime(2026, 1, 1),
+        Description="luz",
+        TransactionDate=date(2026, 1, 10),
+        TransactionValue=Decimal("12.34"),
+    )
+    expense.write(engine=schema_engine)
+    assert (expense.Id, expense.Description) == (1, "Luz")
+    assert expense.TransactionValue == Decimal("12.34")
+    expense.Description, expense.TransactionValue = "água", 5000
+    expense.update(engine=schema_engine)
+    assert (expense.Description, expense.TransactionValue) == ("Água", Decimal("50"))
+
+    selects = [s for s in statements if s.lstrip().startswith("SELECT")]
+    assert len(selects) == (0 if returning else 3)
+
+
+def test_column_metadata_is_set_per_class():
+    assert db.ExpenseEntry._colnames == (
+        "IdExpenseType",
+        "TimeStamp",
+        "Description",
+        "Barcode",
+        "TransactionDate",
+        "TransactionValue",
+    )
+    assert db.ExpenseType._colnames == ("Name",)
+    expense = db.ExpenseEntry(Description="luz")
+    assert expense.required_fieldnames == (
+        "TimeStamp", "Description", "TransactionDate", "TransactionValue"
+    )
+    assert expense.types["TransactionValue"] is db.CurrencyAmount
+    assert list(expense.data) == list(db.ExpenseEntry._colnames)
+    assert expense.data["Description"] == "luz"
+    # shared by instances, and not changeable through them
+    assert expense.display_names is db.ExpenseEntry().display_names
+    with pytest.raises(TypeError):
+        expense.display_names["Description"] = "x"
+
+
+def _summaries(engine) -> dict:
+    with engine.connect() as conn:
+        return {
+            summary.Name: sorted(
+                conn.exec_driver_sql(
+                    f"SELECT Month, {summary.TypeColumn}, TotalValue, EntryCount "
+                    f"FROM {summary.Name}"
+                ).all()
+            )
+            for summary in db.MONTHLY_SUMMARIES
+        }
+
+
+def test_monthly_summary_triggers_match_rebuild(ledger_engine):
+    revenue_type = db.RevenueType(Name="Pix")
+    revenue_type.write(engine=ledger_engine)
+    db.RevenueEntry.write_many(
+        [
+            {"IdRevenueType": revenue_type.Id, "TransactionDate": date(2026, 1, 5),
+             "TransactionValue": 1000},
+            {"IdRevenueType": None, "TransactionDate": date(2026, 1, 6),
+             "TransactionValue": 500},
+            {"IdRevenueType": None, "TransactionDate": None, "TransactionValue": 700},
+        ],
+        engine=ledger_engine,
+    )
+    with ledger_engine.begin() as conn:
+        # moves rows to other months and types, and changes values
+        conn.exec_driver_sql(
+            "UPDATE expenses SET TransactionDate = '2026-05-20' WHERE Id IN (1, 2)"
+        )
+        conn.exec_driver_sql("UPDATE expenses SET IdExpenseType = 2 WHERE Id = 3")
+        conn.exec_driver_sql("UPDATE expenses SET TransactionValue = 1 WHERE Id = 4")
+        conn.exec_driver_sql("DELETE FROM expenses WHERE Id IN (5, 6)")
+        conn.exec_driver_sql(
+            f"UPDATE revenues SET IdRevenueType = {revenue_type.Id}, "
+            "TransactionDate = '2026-02-01' WHERE TransactionDate IS NULL"
+        )
+        conn.exec_driver_sql("UPDATE revenues SET TransactionDate = NULL WHERE Id = 1")
+    from_triggers = _summaries(ledger_engine)
+    db.rebuild_monthly_summaries(ledger_engine)
+    assert _summaries(ledger_engine) == from_triggers
+
+
+def test_monthly_summary_triggers_skip_other_columns(ledger_engine):
+    """Only changes to the summarized columns fire the update triggers."""
+    with ledger_engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TEMP TABLE summary_writes (Id INTEGER)")
+        conn.exec_driver_sql(
+            "CREATE TEMP TRIGGER log_summary_writes "
+            "AFTER UPDATE ON main.expense_monthly_summaries BEGIN "
+            "INSERT INTO summary_writes VALUES (new.Id); END"
+        )
+        conn.exec_driver_sql("UPDATE expenses SET Description = 'Nova', Barcode = '1'")
+        assert conn.exec_driver_sql("SELECT count(*) FROM summary_writes").scalar() == 0
+        conn.exec_driver_sql("UPDATE expenses SET TransactionValue = 1 WHERE Id = 1")
+        assert conn.exec_driver_sql("SELECT count(*) FROM summary_writes").scalar() > 0
+
+
+def test_create_monthly_summaries_again(ledger_engine):
+    db.create_monthly_summaries(ledger_engine)
+    with ledger_engine.connect() as conn:
+        triggers = conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+            "AND name LIKE 'expense_monthly_summaries_%'"
+        ).scalars().all()
+    assert sorted(triggers) == [
+        "expense_monthly_summaries_after_delete",
+        "expense_monthly_summaries_after_insert",
+        "expense_monthly_summaries_after_values_update_new",
+        "expense_monthly_summaries_after_values_update_old",
+    ]
@@ -0,0 +1,43 @@
+import csv
+
+import pytest
+
+from flowat.data import export
+
+
+def test_export_keeps_search_and_sorting(ledger_engine, tmp_path):
+    target = tmp_path / "export" / "gastos.csv"
+    target.parent.mkdir()
+    nrows = export.export_expenses(
+        target,
+        search_text="luz",
+        sort_column="TransactionDate",
+        sort_ascending=False,
+        chunksize=2,
+        engine=ledger_engine,
+    )
+    with open(target, encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f, delimiter=";"))
+    assert nrows == len(rows) == 6
+    assert [row["Id"] for row in rows] == ["9", "3", "11", "5", "7", "1"]
+    assert rows[-1]["TransactionValue"] == "1234,56"
+    assert list(target.parent.iterdir()) == [target]
+
+
+def test_export_parquet_keeps_types(ledger_engine, tmp_path):
+    pytest.importorskip("pyarrow")
+    import pandas as pd
+
+    target = tmp_path / "gastos.parquet"
+    assert export.export_expenses(target, chunksize=4, engine=ledger_engine) == 11
+    frame = pd.read_parquet(target)
+    assert frame["Id"].tolist() == list(range(1, 12))
+    assert frame["TransactionValue"].tolist()[0] == 123456
+
+
+def test_export_unknown_format_writes_nothing(ledger_engine, tmp_path):
+    target = tmp_path / "export" / "gastos.xlsx"
+    target.parent.mkdir()
+    with pytest.raises(ValueError):
+        export.export_expenses(target, engine=ledger_engine)
+    assert list(target.parent.iterdir()) == []
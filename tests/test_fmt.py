@@ -0,0 +1,46 @@
+import pytest
+
+from flowat.data import fmt
+
+
+@pytest.mark.parametrize(
+    "cents, expected",
+    [
+        (0, "0,00"),
+        (5, "0,05"),
+        (123456, "1 234,56"),
+        (100000000, "1 000 000,00"),
+        (-123456789, "-1 234 567,89"),
+    ],
+)
+def test_format_cents(cents, expected):
+    assert fmt.format_cents([cents]) == [expected]
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("1.234,56", 123456),
+        ("-1.234,56", -123456),
+        ("R$ -1.234,56", -123456),
+        ("1.234,56-", -123456),
+        ("+12,50", 1250),
+        ("1.234", 123400),
+        ("1.234.567", 123456700),
+        ("1.234.567,89", 123456789),
+        ("-1234.56", -123456),
+        ("1234.5", 123450),
+        ("12", 1200),
+    ],
+)
+def test_text_to_cents(text, expected):
+    assert fmt.text_to_cents(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["", "abc", "1.23.456", "1,234,56", "12.34,56", "1,005", "-0,001", "1234.567"],
+)
+def test_text_to_cents_invalid(text):
+    with pytest.raises(ValueError):
+        fmt.text_to_cents(text)
@@ -0,0 +1,182 @@
+from urllib.parse import urlsplit
+import http.client
+import subprocess
+import logging
+import json
+import re
+import sys
+import os
+
+import pytest
+
+from flowat import config
+from flowat.const import sys as const_sys
+from flowat.plot import assets, bar, base, svg
+
+X = ["jan", "fev", "mar"]
+Y = [10.0, 20.5, 0.0]
+
+
+@pytest.fixture
+def renderer(tmp_path, monkeypatch):
+    """Light theme, an empty render cache in `tmp_path`, and a function to set the
+    'renderer' option.
+    """
+    monkeypatch.setattr(config.ThemeMode, "get", lambda: "light")
+    const_sys.theme_colors.cache_clear()
+    monkeypatch.setattr(bar, "RENDER_CACHE", base.RenderCache(path=tmp_path / "plots"))
+    monkeypatch.setattr(config.PlotDiskCache, "get", lambda: False)
+
+    def set_renderer(value: str):
+        monkeypatch.setattr(config.PlotRenderer, "get", lambda: value)
+
+    set_renderer("auto")
+    yield set_renderer
+    const_sys.theme_colors.cache_clear()
+
+
+def test_cache_hit_is_not_rendered_again(renderer, monkeypatch):
+    renderer("plotly")
+    monkeypatch.setattr(assets, "plotlyjs_url", lambda: "http://127.0.0.1:1/p.js")
+    html = bar.colplot(X, Y)
+    assert '<script charset="utf-8" src="http://127.0.0.1:1/p.js">' in html
+
+    # the asset server listens on another port after a restart
+    monkeypatch.setattr(bar, "_render_colplot", lambda x, y: pytest.fail("rendered"))
+    monkeypatch.setattr(assets, "plotlyjs_url", lambda: "http://127.0.0.1:2/p.js")
+    assert bar.colplot(X, Y) == html.replace(":1/p.js", ":2/p.js")
+
+
+def test_android_loads_plotlyjs_from_cdn(renderer, monkeypatch):
+    renderer("plotly")
+    monkeypatch.setattr(bar, "platform", "android")
+    monkeypatch.setattr(assets, "plotlyjs_url", lambda: pytest.fail("server started"))
+    html = bar.colplot(X, Y)
+    assert "https://cdn.plot.ly/" in html
+    assert bar._PLOTLYJS_URL_PLACEHOLDER not in html
+
+
+BUNDLED_JS = b"/**\n* plotly.js v9.9.9\n*/\nwindow.Plotly = {};\n"
+
+
+@pytest.fixture
+def plotlyjs(tmp_path, monkeypatch):
+    """Uses a fake plotly.js v9.9.9 as the one bundled with plotly, and a path in
+    `tmp_path` as `PLOTLYJS_PATH`, which is returned. Stops the asset server after
+    the test.
+    """
+    bundled_path = tmp_path / "bundled.min.js"
+    bundled_path.write_bytes(BUNDLED_JS)
+    path = tmp_path / "plotly.min.js"
+    for module in (base, assets):
+        monkeypatch.setattr(module, "PLOTLYJS_PATH", path)
+        monkeypatch.setattr(module, "bundled_plotlyjs_path", lambda: bundled_path)
+    assets.shutdown()
+    yield path
+    assets.shutdown()
+
+
+def _get(url: str, headers: dict | None = None) -> http.client.HTTPResponse:
+    parsed = urlsplit(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=5)
+    conn.request("GET", parsed.path, headers=headers or {})
+    response = conn.getresponse()
+    response.body = response.read()
+    conn.close()
+    return response
+
+
+def test_ensure_plotlyjs_replaces_other_versions(plotlyjs):
+    plotlyjs.write_bytes(b"/**\n* plotly.js v1.0.0\n*/\n")
+    assert base.ensure_plotlyjs() == "9.9.9"
+    assert plotlyjs.read_bytes() == BUNDLED_JS
+    assert base.plotlyjs_file_version() == "9.9.9"
+
+
+def test_asset_server(plotlyjs):
+    url = assets.plotlyjs_url()
+    assert url.endswith("/plotly-9.9.9.min.js")
+    assert urlsplit(url).port != 0
+
+    response = _get(url)
+    assert (response.status, response.body) == (200, BUNDLED_JS)
+    # the WebView keeps the parsed bundle instead of fetching it for every chart
+    assert response.getheader("Cache-Control") == "public, max-age=31536000"
+    etag = response.getheader("ETag")
+
+    assert _get(url, headers={"If-None-Match": etag}).status == 304
+    assert _get(url.replace("9.9.9", "1.0.0")).status == 404
+
+
+def test_asset_server_checks_served_version(plotlyjs, monkeypatch):
+    # another instance wrote an older plotly.js after `ensure_plotlyjs` ran
+    plotlyjs.write_bytes(b"/**\n* plotly.js v1.0.0\n*/\n")
+    monkeypatch.setattr(assets, "ensure_plotlyjs", lambda: "9.9.9")
+    assert _get(assets.plotlyjs_url()).body == BUNDLED_JS
+
+
+def test_import_does_not_load_plotly(tmp_path):
+    """Importing the plot modules should not import plotly, detect the theme or
+    create files, so the app starts without paying for them.
+    """
+    script = (
+        "import sys\n"
+        "import flowat.plot, flowat.plot.bar\n"
+        "from flowat.const import sys as const_sys\n"
+        "assert 'plotly' not in sys.modules, 'plotly was imported'\n"
+        "assert const_sys.theme_colors.cache_info().currsize == 0\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        env={**os.environ, "HOME": str(tmp_path)},
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_svg_colplot(renderer):
+    html = svg.colplot(["jan", "<fev>", "mar"], [50.0, 100.0, -10.0])
+    heights = re.findall(r'<rect [^>]*height="([\d.]+)%"', html)
+    assert heights == ["50.000", "100.000", "0.000"]
+    assert "<title>&lt;fev&gt;: R$ 100,00</title>" in html
+    assert "<span>&lt;fev&gt;</span>" in html
+    assert "<script" not in html and "#fff" in html
+    assert svg.colplot_bars([], []) == ""
+
+
+def test_auto_renderer_uses_svg_for_short_series(renderer, monkeypatch, caplog):
+    monkeypatch.setattr(bar, "_render_colplot", lambda x, y: "plotly")
+    labels = [str(i) for i in range(svg.MAX_BARS)]
+    assert bar.colplot(labels, [1.0] * svg.MAX_BARS) == svg.colplot(
+        labels, [1.0] * svg.MAX_BARS
+    )
+    assert bar.colplot(labels + ["x"], [1.0] * (svg.MAX_BARS + 1)) == "plotly"
+    renderer("svg")
+    assert bar.colplot(labels + ["x"], [1.0] * (svg.MAX_BARS + 1)).startswith(
+        "<!DOCTYPE html>"
+    )
+    renderer("canvas")
+    with caplog.at_level(logging.WARNING, logger=bar.logger.name):
+        assert bar.colplot(labels + ["x"], [1.0] * (svg.MAX_BARS + 1)) == "plotly"
+        assert bar.colplot(X, Y) == svg.colplot(X, Y)
+    assert "'canvas'" in caplog.text
+
+
+def test_svg_colplot_update(renderer):
+    script = bar.colplot_update(["<a>", "b"], [1.0, 2.0])
+    assert f'document.getElementById("{base.CHART_ID}-bars")' in script
+    bars, labels = re.findall(r"\.innerHTML = (.*);", script)
+    # the elements are passed as JSON strings, so labels cannot break the script
+    assert json.loads(bars) == svg.colplot_bars(["<a>", "b"], [1.0, 2.0])
+    assert json.loads(labels) == "<span>&lt;a&gt;</span><span>b</span>"
+
+
+def test_plotly_colplot_update(renderer):
+    renderer("plotly")
+    script = bar.colplot_update(X, Y)
+    assert f'document.getElementById("{base.CHART_ID}")' in script
+    figure = json.loads(re.search(r"var figure = (.*);\n", script).group(1))
+    assert list(figure["data"][0]["x"]) == X
+    assert "Plotly.react(chart, figure.data, figure.layout" in script
@@ -0,0 +1,144 @@
+import os
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import StatementError
+
+from flowat.data import db, pos
+from flowat.data.source import RevenuesSource, RevenueTypeSource
+
+SALES = (
+    "Data;Forma de pagamento;Valor\n"
+    "10/01/2026;Pix;10,00\n"
+    "10/01/2026;pix;5,50\n"
+    "10/01/2026;Dinheiro;-2,00\n"
+    "10/01/2026;Dinheiro;2,00\n"
+    "11/01/2026;;1.234,56\n"
+    "11/01/2026;Pix;abc\n"
+)
+
+
+def _revenues(engine) -> list[tuple]:
+    source = RevenuesSource(engine=engine, raw_cents=True)
+    return sorted(
+        (row.TransactionDate, row.TransactionType, row.TransactionValue)
+        for row in source.current_data
+    )
+
+
+def _imported_files(engine) -> list[tuple]:
+    with db.get_session(engine) as ses:
+        stmt = select(db.ImportedSalesFile.FilePath, db.ImportedSalesFile.ContentHash)
+        return sorted(tuple(row) for row in ses.execute(stmt))
+
+
+@pytest.fixture
+def sales_file(tmp_path):
+    path = tmp_path / "vendas.csv"
+    path.write_text(SALES, encoding="utf-8")
+    return path
+
+
+def test_ingest_sales_file(schema_engine, sales_file):
+    result = pos.ingest_sales_file(sales_file, engine=schema_engine)
+    assert (result.Status, result.Sales, result.Revenues) == ("imported", 5, 2)
+    assert [r.LineNumber for r in result.Rejected] == [7]
+    # refunds cancel out the sales in cash, so there is no revenue for them
+    assert result.Skipped == [pos.SkippedTotal(date(2026, 1, 10), "Dinheiro", 0, 2)]
+    assert _revenues(schema_engine) == [
+        (date(2026, 1, 10), "Pix", 1550),
+        (date(2026, 1, 11), "Não Informado", 123456),
+    ]
+    names = [row.Name for row in RevenueTypeSource(engine=schema_engine).current_data]
+    assert sorted(names) == ["Não Informado", "Pix"]
+
+
+def test_unchanged_file_is_not_read(schema_engine, sales_file, monkeypatch):
+    pos.ingest_sales_file(sales_file, engine=schema_engine)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("unchanged file was read")
+
+    monkeypatch.setattr(pos, "_hash_file", fail)
+    monkeypatch.setattr(pos, "iter_sales", fail)
+    result = pos.ingest_sales_file(sales_file, engine=schema_engine)
+    assert (result.Status, result.Revenues) == ("unchanged", 0)
+    assert len(_revenues(schema_engine)) == 2
+
+
+def test_touched_file_with_same_content_is_skipped(schema_engine, sales_file, monkeypatch):
+    pos.ingest_sales_file(sales_file, engine=schema_engine)
+    stat = sales_file.stat()
+    os.utime(sales_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    monkeypatch.setattr(pos, "iter_sales", lambda path: pytest.fail("file was parsed"))
+    result = pos.ingest_sales_file(sales_file, engine=schema_engine)
+    assert result.Status == "unchanged"
+    assert len(_revenues(schema_engine)) == 2
+    record = pos._get_imported_file(FilePath=str(sales_file), engine=schema_engine)
+    assert record.ModifiedTime == stat.st_mtime_ns + 10**9
+
+
+def test_changed_file_replaces_revenues(schema_engine, sales_file):
+    pos.ingest_sales_file(sales_file, engine=schema_engine)
+    sales_file.write_text(
+        "Data;Forma de pagamento;Valor\n12/01/2026;Cartão;7,00\n", encoding="utf-8"
+    )
+    stat = sales_file.stat()
+    os.utime(sales_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    result = pos.ingest_sales_file(sales_file, engine=schema_engine)
+    assert (result.Status, result.Revenues, result.Skipped) == ("imported", 1, [])
+    assert _revenues(schema_engine) == [(date(2026, 1, 12), "Cartão", 700)]
+    assert len(_imported_files(schema_engine)) == 1
+
+
+def test_copy_of_imported_file_has_no_revenues(schema_engine, sales_file, tmp_path):
+    pos.ingest_sales_file(sales_file, engine=schema_engine)
+    copy = tmp_path / "copia.csv"
+    copy.write_bytes(sales_file.read_bytes())
+
+    result = pos.ingest_sales_file(copy, engine=schema_engine)
+    assert (result.Status, result.Revenues) == ("duplicate", 0)
+    assert len(_revenues(schema_engine)) == 2
+    files = _imported_files(schema_engine)
+    assert [path for path, _ in files] == sorted([str(copy), str(sales_file)])
+    assert files[0][1] == files[1][1]
+    # the copy is recorded, so it is not hashed again
+    assert pos.ingest_sales_file(copy, engine=schema_engine).Status == "unchanged"
+
+
+def test_replace_revenues_failure_writes_nothing(schema_engine):
+    record = db.ImportedSalesFile(
+        FilePath="/vendas.csv",
+        FileSize=1,
+        ModifiedTime=1,
+        ContentHash="abc",
+        ImportedAt=datetime(2026, 1, 1),
+    )
+    revenues = [
+        {
+            "RevenueType": "Pix",
+            "TimeStamp": datetime(2026, 1, 1),
+            "Description": "",
+            "TransactionDate": date(2026, 1, 10),
+            "TransactionValue": 100,
+        }
+    ]
+    with pytest.raises(StatementError):
+        record.replace_revenues(revenues, engine=schema_engine)
+    assert RevenueTypeSource(engine=schema_engine).current_data == []
+    assert _imported_files(schema_engine) == []
+
+
+def test_refunds_exceeding_sales_are_reported(schema_engine, tmp_path):
+    path = tmp_path / "estornos.csv"
+    path.write_text(
+        "Data;Forma de pagamento;Valor\n10/01/2026;Pix;5,00\n10/01/2026;Pix;-8,00\n",
+        encoding="utf-8",
+    )
+    result = pos.ingest_sales_file(path, engine=schema_engine)
+    assert (result.Status, result.Sales, result.Revenues) == ("imported", 2, 0)
+    assert result.Skipped == [pos.SkippedTotal(date(2026, 1, 10), "Pix", -300, 2)]
+    assert _revenues(schema_engine) == []
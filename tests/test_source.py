@@ -0,0 +1,269 @@
+from datetime import date, datetime
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, tuple_, delete, event
+
+from flowat.data import db, source
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    db.DeclaredTable.metadata.create_all(engine)
+    db.create_indexes(engine)
+    return engine
+
+
+@pytest.mark.parametrize("colname", ["Id", "TransactionDate"])
+@pytest.mark.parametrize("ascending", [True, False])
+def test_expenses_pages_use_indexes(engine, colname, ascending):
+    """Every sort order offered by `ExpensesSection.change_sorting` should be read
+    in index order, without sorting the whole table in a temporary b-tree.
+    """
+    src = source.ExpensesSource(engine=engine)
+    stmt = src._get_sorted_select_stmt(
+        stmt=src.SELECT_STMT, colname=colname, ascending=ascending
+    )
+    first_page = db.explain_query_plan(stmt.limit(200), engine=engine)
+    key = tuple_(*src._get_keyset_columns())
+    seek_value = (date(2026, 1, 1), 100) if colname != "Id" else (100,)
+    next_page = db.explain_query_plan(
+        stmt.where(key > seek_value if ascending else key < seek_value).limit(200),
+        engine=engine,
+    )
+    for plan in [first_page, next_page]:
+        assert not any("TEMP B-TREE" in step for step in plan)
+        if colname == "TransactionDate":
+            assert any("ix_expenses_TransactionDate_Id" in step for step in plan)
+    assert "SEARCH expenses" in next_page[0]
+
+
+def _all_rows(src: source._DataSource) -> list:
+    """Rows of `src` in its current search and sort order, without pagination."""
+    stmt = src._get_searched_select_stmt(src.SELECT_STMT, search_text=src.search_text)
+    stmt = src._get_sorted_select_stmt(
+        stmt, colname=src.sort_column, ascending=src.sort_ascending
+    )
+    with db.get_session(src.ENGINE) as ses:
+        return ses.execute(stmt).all()
+
+
+def _pages(all_rows: list, size: int) -> list[list]:
+    return [all_rows[i : i + size] for i in range(0, len(all_rows), size)]
+
+
+@pytest.mark.parametrize("colname", ["Id", "TransactionDate"])
+@pytest.mark.parametrize("ascending", [True, False])
+def test_keyset_pages_match_offset_pages(ledger_engine, page_size, colname, ascending):
+    """Walking forward to the last page and back should show the same rows as
+    slicing the sorted data, including rows that tie on the sort column.
+    """
+    src = source.ExpensesSource(engine=ledger_engine)
+    src.sort_column, src.sort_ascending = colname, ascending
+    expected = _pages(_all_rows(src), size=3)
+    assert len(expected) == 4
+
+    for page_number, page in enumerate(expected, start=1):
+        assert src.current_page == page_number
+        assert src.current_data == page
+        src.fetch_next_page()
+    # already on the last page
+    assert src.current_page == 4
+    assert src.current_data == expected[-1]
+
+    for page_number in range(3, 0, -1):
+        src.fetch_previous_page()
+        assert src.current_page == page_number
+        assert src.current_data == expected[page_number - 1]
+    src.fetch_previous_page()
+    assert src.current_page == 1
+
+
+def test_keyset_pages_without_reading_between(ledger_engine, page_size):
+    """The page number and the rows should agree when pages are skipped without
+    reading `current_data` in between.
+    """
+    src = source.ExpensesSource(engine=ledger_engine)
+    src.sort_column = "TransactionDate"
+    expected = _pages(_all_rows(src), size=3)
+    src.fetch_next_page()
+    src.fetch_next_page()
+    assert src.current_page == 3
+    assert src.current_data == expected[2]
+    src.fetch_previous_page()
+    src.fetch_previous_page()
+    assert src.current_page == 1
+    assert src.current_data == expected[0]
+
+
+def test_keyset_pages_with_search(ledger_engine, page_size):
+    src = source.ExpensesSource(engine=ledger_engine)
+    src.search_text = "luz"
+    expected = _pages(_all_rows(src), size=3)
+    assert [len(page) for page in expected] == [3, 3]
+    assert src.nrows == 6
+    assert src.current_data == expected[0]
+    src.fetch_next_page()
+    assert src.current_data == expected[1]
+    assert all("Luz" in row.Description for row in src.current_data)
+
+    # a new search starts from the first page
+    src.search_text = "água"
+    assert src.current_page == 1
+    assert src.current_data == _pages(_all_rows(src), size=3)[0]
+
+
+def test_page_size_change_returns_to_first_page(ledger_engine, page_size):
+    src = source.ExpensesSource(engine=ledger_engine)
+    src.fetch_next_page()
+    assert src.current_page == 2
+    page_size(4)
+    assert src.current_data == _pages(_all_rows(src), size=4)[0]
+    assert src.current_page == 1
+    src.fetch_next_page()
+    assert src.current_data == _pages(_all_rows(src), size=4)[1]
+
+
+def test_row_count_is_cached_until_any_write(ledger_engine, monkeypatch):
+    monkeypatch.setattr(db, "EXTERNAL_WRITE_CHECK_INTERVAL", 3600)
+    statements = []
+
+    def log_statements(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(ledger_engine, "before_cursor_execute", log_statements)
+    src = source.ExpensesSource(engine=ledger_engine)
+    assert src.nrows == 11
+    # reading the cached count again runs no query at all
+    nstatements = len(statements)
+    assert src.nrows == 11
+    assert len(statements) == nstatements
+
+    # a write through a plain session, outside of `DeclaredTable`
+    with db.SessionFactory(bind=ledger_engine) as ses:
+        ses.execute(delete(db.ExpenseEntry).where(db.ExpenseEntry.Id == 1))
+        ses.commit()
+    assert src.nrows == 10
+
+    # a write by another connection, like another process, shows once the interval
+    # between checks of `PRAGMA data_version` has passed
+    conn = sqlite3.connect(ledger_engine.url.database)
+    conn.execute("DELETE FROM expenses WHERE Id = 2")
+    conn.commit()
+    conn.close()
+    assert src.nrows == 10
+    monkeypatch.setattr(db, "EXTERNAL_WRITE_CHECK_INTERVAL", 0)
+    assert src.nrows == 9
+    assert src.nrows == 9
+    assert len([s for s in statements if "count(*)" in s]) == 3
+
+
+@pytest.mark.parametrize("search_text", ["1 234,56", "1234,56", "1234.56", "1 234"])
+def test_search_by_value_as_displayed_or_stored(ledger_engine, search_text):
+    src = source.ExpensesSource(engine=ledger_engine)
+    assert src._uses_search_index()
+    src.search_text = search_text
+    assert [row.Id for row in src.current_data] == [1]
+
+
+def test_search_by_text_in_any_column(ledger_engine):
+    src = source.ExpensesSource(engine=ledger_engine)
+    src.search_text = "agua cont"
+    assert src.nrows == 5
+    assert all("Água" in row.Description for row in src.current_data)
+
+
+def test_raw_cents_source_selects_integer_cents(ledger_engine):
+    decimals = source.ExpensesSource(engine=ledger_engine)
+    cents = source.ExpensesSource(engine=ledger_engine, raw_cents=True)
+    decimal_values = [row.TransactionValue for row in decimals.current_data]
+    cent_values = [row.TransactionValue for row in cents.current_data]
+    assert all(type(value) is int for value in cent_values)
+    assert cent_values == [int(value * 100) for value in decimal_values]
+    assert cent_values[0] == 123456
+
+
+def _period_totals(src: source._DataSource) -> dict[str, int]:
+    with db.get_session(src.ENGINE) as ses:
+        return dict(ses.execute(src.SELECT_STMT).all())
+
+
+def test_totals_per_period(ledger_engine):
+    src = source.ExpensesByPeriodSource(engine=ledger_engine)
+    assert _period_totals(src) == {
+        "2026-01-01": 22 * 123456, "2026-02-01": 26 * 123456, "2026-03-01": 18 * 123456
+    }
+    assert src.plot_data(n_periods=2) == (
+        ["Fev. 2026", "Mar. 2026"],
+        [26 * 123456 / 100, 18 * 123456 / 100],
+    )
+
+    src.update_date_format("d")
+    assert _period_totals(src) == {
+        "2026-01-10": 22 * 123456, "2026-02-10": 26 * 123456, "2026-03-10": 18 * 123456
+    }
+    assert src.plot_data(n_periods=1)[0] == ["10/03"]
+
+    # weeks start on mondays, 2026-01-05, and end on sundays, 2026-01-11
+    db.ExpenseEntry.write_many(
+        [
+            {
+                "IdExpenseType": 1,
+                "TimeStamp": datetime(2026, 1, 1),
+                "Description": "Conta",
+                "TransactionDate": day,
+                "TransactionValue": 100,
+            }
+            for day in (date(2026, 1, 4), date(2026, 1, 5), date(2026, 1, 11))
+        ],
+        engine=ledger_engine,
+    )
+    src.update_date_format("w")
+    assert _period_totals(src) == {
+        "2025-12-29": 100,
+        "2026-01-05": 22 * 123456 + 200,
+        "2026-02-09": 26 * 123456,
+        "2026-03-09": 18 * 123456,
+    }
+    with pytest.raises(ValueError):
+        src.update_date_format("y")
+
+
+@pytest.mark.parametrize("chunksize", [4, 10000])
+def test_frames_match_current_data(ledger_engine, chunksize):
+    src = source.ExpensesSource(engine=ledger_engine)
+    src.search_text = "conta"
+    src.sort_column, src.sort_ascending = "TransactionDate", False
+    rows = _all_rows(src)
+
+    frames = list(src.iter_frames(chunksize=chunksize))
+    assert [len(frame) for frame in frames][0] == min(chunksize, 11)
+    frame = src.to_frame(chunksize=chunksize)
+    assert list(frame.columns) == list(src.column_names)
+    assert frame["Id"].tolist() == [row.Id for row in rows]
+    assert str(frame["TransactionValue"].dtype) == "int64"
+    assert frame["TransactionValue"].tolist() == [
+        int(row.TransactionValue * 100) for row in rows
+    ]
+    assert str(frame["TransactionDate"].dtype).startswith("datetime64")
+    assert [d.date() for d in frame["TransactionDate"]] == [
+        row.TransactionDate for row in rows
+    ]
+    assert frame["TransactionType"].dtype == "category"
+    assert frame["Description"].tolist() == [row.Description for row in rows]
+
+
+def test_frames_keep_missing_values(ledger_engine):
+    db.RevenueEntry.write_many(
+        [
+            {"TransactionDate": date(2026, 1, 5), "TransactionValue": 1050},
+            {"Description": "Sem data"},
+        ],
+        engine=ledger_engine,
+    )
+    frame = source.RevenuesSource(engine=ledger_engine).to_frame()
+    assert frame["TransactionValue"].tolist()[0] == 1050
+    assert frame["TransactionValue"].isna().tolist() == [False, True]
+    assert frame["TransactionDate"].isna().tolist() == [False, True]
+    assert frame["TransactionType"].isna().all()
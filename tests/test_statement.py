@@ -0,0 +1,118 @@
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from flowat.data import db, statement
+from flowat.data.source import ExpensesSource, ExpenseTypeSource
+
+DATA_DIR = Path(__file__).parent / "data"
+
+
+@pytest.fixture
+def typed_engine(schema_engine):
+    db.ExpenseType.write_many([{"Name": "Luz"}, {"Name": "Água"}], engine=schema_engine)
+    return schema_engine
+
+
+def _expenses(engine) -> list[tuple]:
+    source = ExpensesSource(engine=engine, raw_cents=True)
+    return [
+        (row.TransactionDate, row.TransactionValue, row.Description, row.TransactionType)
+        for row in sorted(source.current_data, key=lambda row: row.Id)
+    ]
+
+
+def test_csv_lines():
+    lines = list(statement.iter_csv_lines(DATA_DIR / "extrato.csv"))
+    assert [line.Description for line in lines] == [
+        "Conta de luz",
+        "Salário",
+        "Mercado",
+        "Aluguel",
+        "Presente",
+        "Padaria",
+        "Padaria",
+    ]
+    assert [line.LineNumber for line in lines] == [2, 3, 4, 5, 6, 7, 8]
+    assert lines[1].Value == "5.000,00"
+
+
+def test_ofx_lines_skip_credits():
+    lines = list(statement.iter_ofx_lines(DATA_DIR / "extrato.ofx"))
+    assert [(line.Date, line.Description, line.Value) for line in lines] == [
+        ("20260105", "Conta de luz", "-1234.56"),
+        ("20260112", "Farmacia", "-89.90"),
+    ]
+
+
+def test_import_csv(typed_engine):
+    result = statement.import_statement(DATA_DIR / "extrato.csv", engine=typed_engine)
+    assert (result.Imported, result.Duplicates, result.Unclassified) == (5, 0, 3)
+    # the credit is reported, not skipped, so unsigned CSVs do not import silently
+    assert [(r.LineNumber, r.Reason) for r in result.Rejected] == [
+        (3, "Não é um débito: '5.000,00'"),
+        (6, "Categoria desconhecida: 'Presentes'"),
+    ]
+    unclassified = statement.UNCLASSIFIED_EXPENSE_TYPE
+    assert _expenses(typed_engine) == [
+        (date(2026, 1, 5), 123456, "Conta De Luz", "Luz"),
+        (date(2026, 1, 7), 123400, "Mercado", unclassified),
+        (date(2026, 1, 8), 123456789, "Aluguel", "Água"),
+        (date(2026, 1, 10), 1250, "Padaria", unclassified),
+        (date(2026, 1, 10), 1250, "Padaria", unclassified),
+    ]
+    names = [row.Name for row in ExpenseTypeSource(engine=typed_engine).current_data]
+    assert sorted(names) == sorted(["Luz", "Água", unclassified])
+
+
+def test_import_ofx(typed_engine):
+    result = statement.import_statement(DATA_DIR / "extrato.ofx", engine=typed_engine)
+    assert (result.Imported, result.Unclassified, result.Rejected) == (2, 2, [])
+    assert [row[:2] for row in _expenses(typed_engine)] == [
+        (date(2026, 1, 5), 123456),
+        (date(2026, 1, 12), 8990),
+    ]
+
+
+@pytest.mark.parametrize("batch_size", [1, 2000])
+def test_reimport_skips_existing_expenses(typed_engine, batch_size):
+    path = DATA_DIR / "extrato.csv"
+    statement.import_statement(path, batch_size=batch_size, engine=typed_engine)
+    before = _expenses(typed_engine)
+
+    result = statement.import_statement(path, batch_size=batch_size, engine=typed_engine)
+    assert (result.Imported, result.Duplicates, result.Unclassified) == (0, 5, 0)
+    assert len(result.Rejected) == 2
+    assert _expenses(typed_engine) == before
+
+
+def test_reimport_writes_only_new_lines(typed_engine):
+    first = statement.StatementLine(1, "10/01/2026", "Padaria", "-12,50", "", "")
+    statement.import_statement([first], engine=typed_engine)
+
+    # same day and value, but the statement now has a second purchase and a new day
+    lines = [
+        first,
+        first._replace(LineNumber=2),
+        first._replace(LineNumber=3, Date="11/01/2026"),
+    ]
+    result = statement.import_statement(lines, engine=typed_engine)
+    assert (result.Imported, result.Duplicates) == (2, 1)
+    assert len(_expenses(typed_engine)) == 3
+
+
+def test_import_rejects_credits_and_fractions_of_cents(typed_engine):
+    lines = [
+        statement.StatementLine(1, "10/01/2026", "Estorno", "12,50", "Luz", ""),
+        statement.StatementLine(2, "10/01/2026", "Zero", "0,00", "Luz", ""),
+        statement.StatementLine(3, "10/01/2026", "Juros", "-1,005", "Luz", ""),
+    ]
+    result = statement.import_statement(lines, engine=typed_engine)
+    assert result.Imported == 0
+    assert [r.Reason for r in result.Rejected] == [
+        "Não é um débito: '12,50'",
+        "Não é um débito: '0,00'",
+        "Valor inválido: '-1,005'",
+    ]
+    assert _expenses(typed_engine) == []
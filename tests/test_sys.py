@@ -0,0 +1,115 @@
+import logging
+import subprocess
+
+import pytest
+
+from flowat import config
+from flowat.const import sys as const_sys
+
+
+class FakeThread:
+    """Records the threads started by `sys_dark_mode`, running them on `join`."""
+
+    started = []
+
+    def __init__(self, target, kwargs, name, daemon):
+        self.target, self.kwargs, self.name = target, kwargs, name
+
+    def start(self):
+        self.started.append(self)
+
+    def join(self):
+        self.target(**self.kwargs)
+
+
+@pytest.fixture
+def theme(tmp_path, monkeypatch):
+    """Uses a temporary theme cache file and no threads, returns a function to set
+    the 'theme' option.
+    """
+    monkeypatch.setattr(const_sys, "THEME_CACHE_FILE", tmp_path / "theme.cache")
+    monkeypatch.setattr(const_sys, "Thread", FakeThread)
+    monkeypatch.setattr(FakeThread, "started", [])
+
+    def set_theme(value: str):
+        monkeypatch.setattr(config.ThemeMode, "get", lambda: value)
+
+    set_theme("auto")
+    return set_theme
+
+
+def _probe(monkeypatch, dark: bool | None) -> list[float]:
+    """Makes the OS answer `dark`, returns the timeouts of the calls made."""
+    timeouts = []
+
+    def probe_dark_mode(timeout):
+        timeouts.append(timeout)
+        return dark
+
+    monkeypatch.setattr(const_sys, "_probe_dark_mode", probe_dark_mode)
+    return timeouts
+
+
+def test_pinned_theme_skips_probe(theme, monkeypatch):
+    timeouts = _probe(monkeypatch, dark=False)
+    theme("dark")
+    assert const_sys.sys_dark_mode() is True
+    theme("light")
+    assert const_sys.sys_dark_mode() is False
+    assert timeouts == [] and FakeThread.started == []
+
+
+def test_invalid_theme_falls_back_to_auto(theme, monkeypatch, caplog):
+    _probe(monkeypatch, dark=True)
+    theme("darkk")
+    with caplog.at_level(logging.WARNING, logger=const_sys.logger.name):
+        assert const_sys.sys_dark_mode() is True
+    assert "'darkk'" in caplog.text
+
+
+def test_first_probe_writes_cache(theme, monkeypatch):
+    timeouts = _probe(monkeypatch, dark=True)
+    assert const_sys.sys_dark_mode() is True
+    assert timeouts == [const_sys.THEME_PROBE_TIMEOUT]
+    assert const_sys.THEME_CACHE_FILE.read_text(encoding="utf-8") == "dark"
+    assert FakeThread.started == []
+
+
+def test_cached_theme_is_refreshed_in_background(theme, monkeypatch):
+    const_sys.THEME_CACHE_FILE.write_text("dark", encoding="utf-8")
+    timeouts = _probe(monkeypatch, dark=False)
+
+    # the cached theme is used without waiting for the OS
+    assert const_sys.sys_dark_mode() is True
+    assert timeouts == []
+    [thread] = FakeThread.started
+    assert thread.name == "theme-probe"
+
+    thread.join()
+    assert timeouts == [const_sys.THEME_REFRESH_TIMEOUT]
+    assert const_sys.THEME_CACHE_FILE.read_text(encoding="utf-8") == "light"
+    assert const_sys.sys_dark_mode() is False
+
+
+def test_probe_timeout_assumes_light_mode(theme, monkeypatch):
+    timeouts = _probe(monkeypatch, dark=None)
+    assert const_sys.sys_dark_mode() is False
+    assert not const_sys.THEME_CACHE_FILE.exists()
+    # the OS may still answer in the background, for the next launch
+    [thread] = FakeThread.started
+    _probe(monkeypatch, dark=True)
+    thread.join()
+    assert const_sys.THEME_CACHE_FILE.read_text(encoding="utf-8") == "dark"
+    assert timeouts == [const_sys.THEME_PROBE_TIMEOUT]
+
+
+def test_linux_probe_timeout(monkeypatch):
+    calls = []
+
+    def run(args, timeout, **kwargs):
+        calls.append(timeout)
+        raise subprocess.TimeoutExpired(args, timeout)
+
+    monkeypatch.setattr(subprocess, "run", run)
+    assert const_sys._linux_dark_mode(timeout=0.1) is None
+    assert calls == [0.1]